@@ -2,36 +2,85 @@
 FastAPI backend for Rift Rewind.
 League of Legends match analysis and year-end review generator.
 """
-from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request, BackgroundTasks, Body
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
-import sys
+from starlette.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 import os
-import uuid
 import asyncio
+import hashlib
+import time
+import orjson
+from secrets import token_hex
 
-# Add parent directory to path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
+# `services` resolves from the backend/ app dir, which uvicorn puts on sys.path
+# (all launch commands run `uvicorn app.main:app` from backend/).
 from services import riot_api, profile_service, structured_analysis_service
 # from services import year_rewind_agent  # Commented out - uses old LangChain API
 from services.config import config
 from services.cache_manager import cache_manager
 from services.progress_tracker import progress_tracker
+from services import http_client
+from services.logger import logger
 from . import schemas
+from .orjson_response import ORJSONResponse
 
-app = FastAPI(title="Rift Rewind API", version="1.0.0")
+app = FastAPI(
+    title="Rift Rewind API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse
+)
 
-# CORS middleware - supports multiple origins from environment variable
-allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
+# CORS middleware - supports multiple origins from environment variable.
+# Methods/headers are listed explicitly (only what the frontend sends) and
+# preflight results are cached by the browser for a day.
+allowed_origins = tuple(os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(","))
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=("GET", "POST", "OPTIONS"),
+    allow_headers=("content-type", "authorization"),
+    max_age=86400,
 )
 
+
+class SSEAwareGZipMiddleware(GZipMiddleware):
+    """GZip responses except the SSE progress stream, which must not be buffered."""
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/progress"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Analysis payloads are 10-50KB of JSON; compress anything over 1KB
+app.add_middleware(SSEAwareGZipMiddleware, minimum_size=1024, compresslevel=5)
+
+
+def _cached_json_response(request: Request, payload: dict, max_age: int = 60) -> Response:
+    """
+    Build a JSON response with a weak ETag so clients can revalidate.
+    Returns 304 Not Modified when the client's If-None-Match still matches.
+    """
+    body = orjson.dumps(payload)
+    etag = f'W/"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={max_age}"
+    }
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Strong references to fire-and-forget startup tasks
+_background_tasks = set()
+
+
 @app.on_event("startup")
 async def startup_event():
     """Validate configuration on startup."""
@@ -39,14 +88,27 @@ async def startup_event():
     print("🚀 Rift Rewind API Starting...")
     print("="*60)
     
-    is_valid, error = config.validate()
+    # Open the shared HTTP connection pool used for all Riot API calls and
+    # pre-connect in the background so the first analysis skips the handshakes
+    http_client.get_client()
+    warm_up_task = asyncio.create_task(http_client.warm_up())
+    _background_tasks.add(warm_up_task)
+    warm_up_task.add_done_callback(_background_tasks.discard)
+    
+    # Periodically persist match/profile cache writes
+    _background_tasks.add(asyncio.create_task(cache_manager.run_flusher()))
+    
+    # Config is re-validated below, so drop any cached health response
+    _health_cache["ts"] = 0.0
+    
+    is_valid, error = config.validate(refresh=True)
     if not is_valid:
         print(f"\n❌ Configuration Error:\n{error}\n")
         print("="*60 + "\n")
         # Continue anyway for development, but warn
     else:
         print(config.get_summary())
-        cache_stats = cache_manager.get_cache_stats()
+        cache_stats = await asyncio.to_thread(cache_manager.get_cache_stats)
         print(f"📦 Cache Status:")
         print(f"   Matches: {cache_stats['total_matches']} ({cache_stats['fresh_matches']} fresh)")
         print(f"   Profiles: {cache_stats['total_profiles']}")
@@ -54,6 +116,18 @@ async def startup_event():
         print("="*60 + "\n")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release shared resources on shutdown."""
+    _health_cache["ts"] = 0.0
+    
+    for task in _background_tasks:
+        task.cancel()
+    await cache_manager.flush_async()
+    
+    await http_client.close_client()
+
+
 @app.get("/")
 async def root():
     """Health check endpoint."""
@@ -64,7 +138,7 @@ async def root():
 
 
 @app.get("/api/player/{game_name}/{tag_line}")
-async def get_player(game_name: str, tag_line: str):
+async def get_player(game_name: str, tag_line: str, request: Request):
     """
     Get basic player info (PUUID).
     
@@ -76,18 +150,19 @@ async def get_player(game_name: str, tag_line: str):
         Player PUUID
     """
     try:
-        puuid = await riot_api.get_puuid_by_riot_id(game_name, tag_line)
+        rid = riot_api.RiotId.parse(game_name, tag_line)
+        puuid = await riot_api.get_puuid(rid)
         
         if not puuid:
             raise HTTPException(
                 status_code=404,
-                detail=f"Player {game_name}#{tag_line} not found"
+                detail=f"Player {rid.display} not found"
             )
         
-        return {
+        return _cached_json_response(request, {
             "puuid": puuid,
-            "riot_id": f"{game_name}#{tag_line}"
-        }
+            "riot_id": rid.display
+        })
         
     except HTTPException:
         raise
@@ -109,29 +184,57 @@ async def generate_year_rewind(game_name: str, tag_line: str):
 """
 
 
-@app.get("/api/health")
-async def health_check() -> schemas.HealthResponse:
+# Last serialized health response; probes within HEALTH_CACHE_SECONDS reuse it
+HEALTH_CACHE_SECONDS = 1.0
+_health_cache = {"body": None, "ts": 0.0}
+
+
+@app.get(
+    "/api/health",
+    response_model=None,
+    responses={200: {"model": schemas.HealthResponse}}
+)
+async def health_check() -> Response:
     """Check if API and services are healthy."""
     from services.rate_limiter import rate_limiter
     
+    now = time.monotonic()
+    if _health_cache["body"] is not None and now - _health_cache["ts"] < HEALTH_CACHE_SECONDS:
+        return Response(content=_health_cache["body"], media_type="application/json")
+    
     stats = rate_limiter.get_stats()
-    cache_stats = cache_manager.get_cache_stats()
+    # Cache stats scan every match for freshness - keep that off the event loop
+    cache_stats = await asyncio.to_thread(cache_manager.get_cache_stats)
     is_valid, _ = config.validate()
     
-    return schemas.HealthResponse(
+    health = schemas.HealthResponse(
         status="healthy" if is_valid else "degraded",
         rate_limiter=schemas.RateLimiterStats(**stats),
         cache=schemas.CacheStats(**cache_stats),
         config_valid=is_valid
     )
+    
+    body = orjson.dumps(health.model_dump())
+    _health_cache["body"] = body
+    _health_cache["ts"] = now
+    
+    return Response(content=body, media_type="application/json")
 
 
-@app.get("/api/profile/{game_name}/{tag_line}")
-async def get_profile(game_name: str, tag_line: str) -> schemas.ProfileResponse:
+@app.get(
+    "/api/profile/{game_name}/{tag_line}",
+    response_model=None,
+    responses={200: {"model": schemas.ProfileResponse}}
+)
+async def get_profile(game_name: str, tag_line: str, request: Request) -> Response:
     """
     Get player profile with summoner info, rank, and main role.
     Fast endpoint (<5 seconds) for initial profile display.
     
+    The profile dict comes straight from profile_service, so it is
+    serialized as-is instead of being re-validated through ProfileResponse.
+    Successful responses carry an ETag so repeat navigations can get a 304.
+    
     Args:
         game_name: Player name (before #)
         tag_line: Tag (after #)
@@ -143,95 +246,126 @@ async def get_profile(game_name: str, tag_line: str) -> schemas.ProfileResponse:
         result = await profile_service.get_player_profile(game_name, tag_line)
         
         if not result.get('success'):
-            return schemas.ProfileResponse(
-                success=False,
-                error=result.get('error', 'Failed to fetch profile')
-            )
+            return ORJSONResponse({
+                "success": False,
+                "error": result.get('error', 'Failed to fetch profile')
+            })
         
         profile_data = result['profile']
         
-        return schemas.ProfileResponse(
-            success=True,
-            profile=schemas.ProfileData(**profile_data)
-        )
+        return _cached_json_response(request, {
+            "success": True,
+            "profile": profile_data
+        })
         
     except Exception as e:
-        print(f"Error in profile endpoint: {e}")
-        return schemas.ProfileResponse(
-            success=False,
-            error=str(e)
-        )
+        logger.exception("Profile endpoint failed")
+        return ORJSONResponse({
+            "success": False,
+            "error": str(e)
+        })
 
 
-@app.post("/api/analysis/{game_name}/{tag_line}")
+# Bounds concurrent analyses; extra requests get 503 instead of queueing
+analysis_semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_ANALYSES or 4)
+ANALYSIS_RETRY_AFTER_SECONDS = 30
+
+
+@app.post(
+    "/api/analysis/{game_name}/{tag_line}",
+    response_model=None,
+    responses={200: {"model": schemas.AnalysisResponse}}
+)
 async def generate_analysis(
     game_name: str, 
     tag_line: str, 
     background_tasks: BackgroundTasks,
-    request: schemas.AnalysisRequest = schemas.AnalysisRequest()
-) -> schemas.AnalysisResponse:
+    num_matches: int = Body(100, ge=10, le=200, embed=True, description="Number of matches to analyze")
+) -> ORJSONResponse:
     """
     Generate structured AI analysis for dashboard.
     Returns analysis ID for progress tracking via SSE.
     
     Expected time: 3-6 minutes depending on match count.
+    The analysis dict is built internally by structured_analysis_service,
+    so it is serialized directly without a Pydantic round-trip.
     
     Args:
         game_name: Player name (before #)
         tag_line: Tag (after #)
         background_tasks: FastAPI background tasks
-        request: Analysis configuration (num_matches)
+        num_matches: Number of matches to analyze (body field, 10-200)
     
     Returns:
-        Structured analysis data for frontend with analysis_id
+        Structured analysis data for frontend with analysis_id,
+        or 503 with Retry-After when all analysis slots are busy
     """
+    if analysis_semaphore.locked():
+        return ORJSONResponse(
+            {"success": False, "error": "Server busy, please retry shortly"},
+            status_code=503,
+            headers={"Retry-After": str(ANALYSIS_RETRY_AFTER_SECONDS)}
+        )
+    
+    async with analysis_semaphore:
+        return await _run_analysis(game_name, tag_line, num_matches)
+
+
+async def _run_analysis(game_name: str, tag_line: str, num_matches: int) -> ORJSONResponse:
+    """Run one structured analysis; caller holds an analysis slot."""
     # Generate unique analysis ID for progress tracking
-    analysis_id = str(uuid.uuid4())
+    analysis_id = token_hex(16)
     
     try:
         # Start analysis with progress tracking
         result = await structured_analysis_service.generate_structured_analysis(
             game_name=game_name,
             tag_line=tag_line,
-            num_matches=request.num_matches,
+            num_matches=num_matches,
             analysis_id=analysis_id  # Pass for progress tracking
         )
         
         if not result.get('success'):
-            return schemas.AnalysisResponse(
-                success=False,
-                error=result.get('error', 'Analysis failed')
-            )
+            return ORJSONResponse({
+                "success": False,
+                "error": result.get('error', 'Analysis failed')
+            })
         
-        response = schemas.AnalysisResponse(
-            success=True,
-            data=schemas.AnalysisData(**result['data'])
-        )
-        response.analysis_id = analysis_id
-        return response
+        return ORJSONResponse({
+            "success": True,
+            "data": result['data'],
+            "analysis_id": analysis_id
+        })
         
     except Exception as e:
-        print(f"Error in analysis endpoint: {e}")
-        return schemas.AnalysisResponse(
-            success=False,
-            error=str(e)
-        )
+        logger.exception("Analysis endpoint failed")
+        return ORJSONResponse({
+            "success": False,
+            "error": str(e)
+        })
 
 
 @app.get("/api/analysis/{analysis_id}/progress")
-async def stream_analysis_progress(analysis_id: str):
+async def stream_analysis_progress(analysis_id: str, request: Request):
     """
     Stream real-time progress updates via Server-Sent Events (SSE).
     Frontend can subscribe to this to show progress bar.
     
+    Reconnecting clients send Last-Event-ID and only receive newer updates.
+    
     Args:
         analysis_id: Unique analysis identifier
         
     Returns:
         SSE stream with progress updates
     """
+    last_event_id = request.headers.get("last-event-id")
+    
     return StreamingResponse(
-        progress_tracker.stream_progress(analysis_id),
+        progress_tracker.stream_progress(
+            analysis_id,
+            last_event_id=int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+        ),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -2,11 +2,18 @@
 Pydantic schemas for type-safe API responses.
 """
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict
+
+# Profile/analysis response models document the API shape; the endpoints
+# serialize the service dicts directly to avoid re-validating trusted data.
+
+class Schema(BaseModel):
+    """Base for API schemas: immutable, ignores unknown fields."""
+    model_config = ConfigDict(extra='ignore', frozen=True)
 
 # ========== Profile Schemas ==========
 
-class RankInfo(BaseModel):
+class RankInfo(Schema):
     tier: str
     division: str
     lp: int
@@ -15,7 +22,7 @@ class RankInfo(BaseModel):
     win_rate: float
     display: str
 
-class ProfileData(BaseModel):
+class ProfileData(Schema):
     puuid: str
     display_name: str
     profile_icon_url: str
@@ -23,24 +30,24 @@ class ProfileData(BaseModel):
     rank: RankInfo
     main_role: str
 
-class ProfileResponse(BaseModel):
+class ProfileResponse(Schema):
     success: bool
     profile: Optional[ProfileData] = None
     error: Optional[str] = None
 
 # ========== Analysis Schemas ==========
 
-class ChampionStats(BaseModel):
+class ChampionStats(Schema):
     name: str
     games: int
     winRate: float
     kda: Optional[float] = None
 
-class Highlight(BaseModel):
+class Highlight(Schema):
     stat: str
     value: str
 
-class AnalysisData(BaseModel):
+class AnalysisData(Schema):
     displayName: str
     profilePicture: str
     mainRole: str
@@ -48,34 +55,32 @@ class AnalysisData(BaseModel):
     highlights: List[Highlight]
     aiInsight: str
     personality: str
+    recommendedActions: List[str] = []
     rank: str
     matchesAnalyzed: int
 
-class AnalysisResponse(BaseModel):
+class AnalysisResponse(Schema):
     success: bool
     data: Optional[AnalysisData] = None
     error: Optional[str] = None
     progress: Optional[str] = None  # For progress updates
     analysis_id: Optional[str] = None  # For SSE progress tracking
 
-class AnalysisRequest(BaseModel):
-    num_matches: int = Field(default=100, ge=10, le=200, description="Number of matches to analyze")
-
 # ========== Health Check Schema ==========
 
-class RateLimiterStats(BaseModel):
+class RateLimiterStats(Schema):
     requests_last_second: int
     requests_last_2_minutes: int
     capacity_1s: str
     capacity_2min: str
 
-class CacheStats(BaseModel):
+class CacheStats(Schema):
     total_matches: int
     fresh_matches: int
     total_profiles: int
     cache_size_mb: float
 
-class HealthResponse(BaseModel):
+class HealthResponse(Schema):
     status: str
     rate_limiter: RateLimiterStats
     cache: Optional[CacheStats] = None
@@ -83,7 +88,7 @@ class HealthResponse(BaseModel):
 
 # ========== Error Response ==========
 
-class ErrorResponse(BaseModel):
+class ErrorResponse(Schema):
     success: bool = False
     error: str
     detail: Optional[str] = None
@@ -9,12 +9,12 @@ import pandas as pd
 import httpx
 import os
 import json
+import orjson
 import re
 import boto3
 from dotenv import load_dotenv
 from langchain_aws import ChatBedrock
 from . import riot_api
-from .rate_limiter import rate_limiter
 from .bedrock_rate_limiter import bedrock_rate_limiter
 from .cache_manager import cache_manager
 
@@ -47,9 +47,18 @@ RANKED_FLEX = 440
 NORMAL_DRAFT = 400
 NORMAL_BLIND = 430
 
-RANKED_QUEUES = [RANKED_SOLO, RANKED_FLEX]
-NORMAL_QUEUES = [NORMAL_DRAFT, NORMAL_BLIND]
-VALID_QUEUES = RANKED_QUEUES + NORMAL_QUEUES
+RANKED_QUEUES = frozenset({RANKED_SOLO, RANKED_FLEX})
+NORMAL_QUEUES = frozenset({NORMAL_DRAFT, NORMAL_BLIND})
+VALID_QUEUES = RANKED_QUEUES | NORMAL_QUEUES
+
+MULTIKILL_COLUMNS = ['double_kills', 'triple_kills', 'quadra_kills', 'penta_kills']
+
+# Most recent matches inspected to estimate the ranked/normal split
+CATEGORIZE_SAMPLE_SIZE = 50
+
+# Match-id pages keyed by (puuid, start, count, startTime) -> (etag, last_modified, ids)
+ID_PAGE_CACHE_MAX_SIZE = 5000
+_id_page_cache: Dict[Tuple[str, int, int, int], Tuple[Optional[str], Optional[str], List[str]]] = {}
 
 
 # ========== SMART MATCH FETCHING ==========
@@ -72,54 +81,45 @@ async def fetch_matches_intelligently(
     """
     print("\n🔍 Analyzing player match history...")
     
+    # Day-aligned so repeat lookups hit the same conditional-request cache key
     cutoff_date = datetime.now() - timedelta(days=max_age_days)
+    cutoff_date = cutoff_date.replace(hour=0, minute=0, second=0, microsecond=0)
     start_time = int(cutoff_date.timestamp())
     
-    all_match_ids = []
-    start_index = 0
     batch_size = 100
     max_discovery = 300  # Fetch up to 300 IDs to discover patterns
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        while len(all_match_ids) < max_discovery:
-            await rate_limiter.wait_if_needed()
+    # Probe the first page to learn whether more history exists
+    first_page = await _fetch_match_id_page(puuid, 0, batch_size, start_time)
+    all_match_ids = list(first_page or [])
+    
+    sample_results = None
+    
+    if len(all_match_ids) < batch_size:
+        print(f"   Found all {len(all_match_ids)} available matches")
+    else:
+        # The categorization sample is the most recent matches, all on the first
+        # page, so start categorizing while the remaining pages are in flight
+        sample_task = asyncio.create_task(
+            _get_match_queue_ids(all_match_ids[:CATEGORIZE_SAMPLE_SIZE])
+        )
+        
+        # Pages are addressed by index, so fetch the rest in parallel
+        pages = await asyncio.gather(*[
+            _fetch_match_id_page(puuid, start, batch_size, start_time)
+            for start in range(batch_size, max_discovery, batch_size)
+        ])
+        sample_results = await sample_task
+        
+        for page in pages:
+            if not page:
+                print(f"   Reached end of history at {len(all_match_ids)} matches")
+                break
             
-            url = f"https://americas.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids"
-            params = {
-                "start": start_index,
-                "count": batch_size,
-                "startTime": start_time
-            }
+            all_match_ids.extend(page)
             
-            try:
-                response = await client.get(url, headers=HEADERS, params=params)
-                rate_limiter.record_request()
-                
-                if response.status_code == 200:
-                    batch = response.json()
-                    
-                    if not batch:
-                        print(f"   Reached end of history at {len(all_match_ids)} matches")
-                        break
-                    
-                    all_match_ids.extend(batch)
-                    start_index += len(batch)
-                    
-                    if len(batch) < batch_size:
-                        print(f"   Found all {len(all_match_ids)} available matches")
-                        break
-                        
-                elif response.status_code == 429:
-                    retry_after = int(response.headers.get('Retry-After', 10))
-                    print(f"   ⏳ Rate limited, waiting {retry_after}s")
-                    await asyncio.sleep(retry_after)
-                    continue
-                else:
-                    print(f"   ❌ API error {response.status_code}")
-                    break
-                    
-            except Exception as e:
-                print(f"   ❌ Error: {e}")
+            if len(page) < batch_size:
+                print(f"   Found all {len(all_match_ids)} available matches")
                 break
     
     total_available = len(all_match_ids)
@@ -132,15 +132,81 @@ async def fetch_matches_intelligently(
     # Now categorize and select best matches
     selected, metadata = await _select_best_matches(
         all_match_ids=all_match_ids,
-        target=target_matches
+        target=target_matches,
+        sample_results=sample_results
     )
     
     return selected, metadata
 
 
+async def _fetch_match_id_page(
+    puuid: str,
+    start: int,
+    count: int,
+    start_time: int
+) -> Optional[List[str]]:
+    """
+    Fetch one page of match IDs (retried via riot_api). Returns None on error.
+    
+    Match lists grow as the player keeps playing, so instead of a TTL the
+    page is revalidated with the ETag / Last-Modified Riot sent last time;
+    a 304 reuses the stored IDs for the cost of the headers.
+    """
+    url = f"https://americas.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids"
+    params = {
+        "start": start,
+        "count": count,
+        "startTime": start_time
+    }
+    
+    cache_key = (puuid, start, count, start_time)
+    cached = _id_page_cache.get(cache_key)
+    headers = HEADERS
+    if cached:
+        etag, last_modified, _ = cached
+        headers = dict(HEADERS)
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    
+    try:
+        response = await riot_api.request_with_retry(url, params=params, headers=headers)
+        
+        if response.status_code == 304 and cached:
+            return cached[2]
+        elif response.status_code == 200:
+            page = orjson.loads(response.content)
+            _store_id_page(cache_key, response, page)
+            return page
+        else:
+            print(f"   ❌ API error {response.status_code}")
+            return None
+            
+    except Exception as e:
+        print(f"   ❌ Error: {e}")
+        return None
+
+
+def _store_id_page(cache_key: Tuple, response: httpx.Response, page: List[str]):
+    """Remember a match-id page with its validators for conditional refetch."""
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    
+    if not etag and not last_modified:
+        return
+    
+    _id_page_cache.pop(cache_key, None)
+    if len(_id_page_cache) >= ID_PAGE_CACHE_MAX_SIZE:
+        # Evict the oldest entry (dicts keep insertion order)
+        del _id_page_cache[next(iter(_id_page_cache))]
+    _id_page_cache[cache_key] = (etag, last_modified, page)
+
+
 async def _select_best_matches(
     all_match_ids: List[str],
-    target: int
+    target: int,
+    sample_results: Optional[List[Tuple[str, Optional[int]]]] = None
 ) -> Tuple[List[str], Dict[str, Any]]:
     """
     Select best matches to analyze (prioritize ranked).
@@ -148,6 +214,7 @@ async def _select_best_matches(
     Args:
         all_match_ids: All available match IDs
         target: How many matches we want
+        sample_results: Queue IDs for the sample if already categorized
     
     Returns:
         Tuple of (selected_ids, metadata)
@@ -165,30 +232,25 @@ async def _select_best_matches(
     
     # Need to categorize - sample first 50 to understand game types
     print(f"   Strategy: Selecting best {target} from {total_available} matches")
-    print(f"   🔍 Categorizing match types (sampling 50)...")
+    print(f"   🔍 Categorizing match types (sampling {CATEGORIZE_SAMPLE_SIZE})...")
     
-    sample_size = min(50, total_available)
+    sample_size = min(CATEGORIZE_SAMPLE_SIZE, total_available)
     sample_ids = all_match_ids[:sample_size]
     
     ranked_ids = []
     normal_ids = []
     other_ids = []
     
-    # Categorize sample in batches
-    batch_size = 10
-    for i in range(0, len(sample_ids), batch_size):
-        batch = sample_ids[i:i + batch_size]
-        
-        tasks = [_get_match_queue_id(mid) for mid in batch]
-        results = await asyncio.gather(*tasks)
-        
-        for match_id, queue_id in results:
-            if queue_id in RANKED_QUEUES:
-                ranked_ids.append(match_id)
-            elif queue_id in NORMAL_QUEUES:
-                normal_ids.append(match_id)
-            else:
-                other_ids.append(match_id)
+    # Categorize sample (riot_api.get_match_cached bounds concurrency)
+    results = sample_results or await _get_match_queue_ids(sample_ids)
+    
+    for match_id, queue_id in results:
+        if queue_id in RANKED_QUEUES:
+            ranked_ids.append(match_id)
+        elif queue_id in NORMAL_QUEUES:
+            normal_ids.append(match_id)
+        else:
+            other_ids.append(match_id)
     
     ranked_ratio = len(ranked_ids) / sample_size if sample_size > 0 else 0
     normal_ratio = len(normal_ids) / sample_size if sample_size > 0 else 0
@@ -213,23 +275,19 @@ async def _select_best_matches(
             
             # If we need more, continue fetching and filtering
             if len(selected) < target:
-                remaining_ids = [mid for mid in all_match_ids if mid not in ranked_ids]
+                ranked_set = set(ranked_ids)
+                remaining_ids = [mid for mid in all_match_ids if mid not in ranked_set]
                 additional_needed = target - len(selected)
                 
-                # Fetch more in batches to find ranked
-                for i in range(0, min(len(remaining_ids), additional_needed * 2), batch_size):
-                    if len(selected) >= target:
-                        break
-                    
-                    batch = remaining_ids[i:i + batch_size]
-                    tasks = [_get_match_queue_id(mid) for mid in batch]
-                    results = await asyncio.gather(*tasks)
-                    
-                    for match_id, queue_id in results:
-                        if queue_id in RANKED_QUEUES:
-                            selected.append(match_id)
-                            if len(selected) >= target:
-                                break
+                # Fetch more candidates to find ranked
+                candidates = remaining_ids[:additional_needed * 2]
+                results = await _get_match_queue_ids(candidates)
+                
+                for match_id, queue_id in results:
+                    if queue_id in RANKED_QUEUES:
+                        selected.append(match_id)
+                        if len(selected) >= target:
+                            break
             
             strategy = "ranked_only"
         else:
@@ -241,7 +299,8 @@ async def _select_best_matches(
             
             # If still need more, take from unsampled
             if len(selected) < target:
-                unsampled = [mid for mid in all_match_ids if mid not in sample_ids]
+                sample_set = set(sample_ids)
+                unsampled = [mid for mid in all_match_ids if mid not in sample_set]
                 selected.extend(unsampled[:target - len(selected)])
             
             strategy = "ranked_priority"
@@ -263,31 +322,33 @@ async def _select_best_matches(
     return selected, metadata
 
 
-async def _get_match_queue_id(match_id: str) -> Tuple[str, Optional[int]]:
-    """Helper to get queue ID for a match."""
-    await rate_limiter.wait_if_needed()
+async def _get_match_queue_ids(match_ids: List[str]) -> List[Tuple[str, Optional[int]]]:
+    """
+    Get queue IDs for matches through the shared match fetch.
     
-    url = f"https://americas.api.riotgames.com/lol/match/v5/matches/{match_id}"
+    Categorizing needs the full match payload anyway, so newly downloaded
+    matches are cached here and get_match_details_batch serves them for free.
+    """
+    matches = await asyncio.gather(*[riot_api.get_match_cached(mid) for mid in match_ids])
     
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, headers=HEADERS)
-            rate_limiter.record_request()
-            
-            if response.status_code == 200:
-                data = response.json()
-                return match_id, data['info']['queueId']
-    except:
-        pass
+    newly_fetched = {
+        mid: match_data for mid, match_data in zip(match_ids, matches)
+        if match_data is not None and mid not in cache_manager.matches_cache
+    }
+    if newly_fetched:
+        cache_manager.store_matches_batch(newly_fetched)
     
-    return match_id, None
+    return [
+        (mid, extract_queue_id(match_data) if match_data else None)
+        for mid, match_data in zip(match_ids, matches)
+    ]
 
 
 # ========== DATA FETCHING ==========
 
 async def get_match_details_batch(match_ids: List[str]) -> List[Dict[str, Any]]:
     """
-    Fetch match details in batches with rate limiting and caching.
+    Fetch match details concurrently with rate limiting and caching.
     
     Args:
         match_ids: List of match IDs
@@ -303,7 +364,7 @@ async def get_match_details_batch(match_ids: List[str]) -> List[Dict[str, Any]]:
     
     # Check cache first
     for match_id in match_ids:
-        cached = cache_manager.get_match(match_id)
+        cached = cache_manager.get_match(match_id, max_age_hours=riot_api.MATCH_CACHE_MAX_AGE_HOURS)
         if cached:
             results.append(cached)
             cache_hits += 1
@@ -319,64 +380,26 @@ async def get_match_details_batch(match_ids: List[str]) -> List[Dict[str, Any]]:
     
     print(f"   🌐 Fetching {len(to_fetch)} new matches from API...")
     
-    total = len(to_fetch)
+    # One gather over everything; riot_api.get_match_cached bounds concurrency
+    # so a slow request never stalls a whole batch behind it
+    fetched = await asyncio.gather(*[riot_api.get_match_cached(mid) for mid in to_fetch])
     
-    # Process in small batches to respect rate limits
-    batch_size = 10
+    # Store in cache and add to results
+    newly_fetched = {}
+    for match_id, match_data in zip(to_fetch, fetched):
+        if match_data is not None:
+            results.append(match_data)
+            newly_fetched[match_id] = match_data
     
-    for i in range(0, len(to_fetch), batch_size):
-        batch = to_fetch[i:i + batch_size]
-        
-        tasks = []
-        for match_id in batch:
-            tasks.append(_fetch_match_with_retry(match_id))
-        
-        batch_results = await asyncio.gather(*tasks)
-        
-        # Store in cache and add to results
-        newly_fetched = {}
-        for match_id, match_data in zip(batch, batch_results):
-            if match_data is not None:
-                results.append(match_data)
-                newly_fetched[match_id] = match_data
-        
-        # Batch save to cache
-        if newly_fetched:
-            cache_manager.store_matches_batch(newly_fetched)
-        
-        progress = min((i + batch_size) / total * 100, 100)
-        fetched_count = len([r for r in batch_results if r is not None])
-        print(f"   Progress: {progress:.0f}% ({len(results)}/{len(match_ids)})", end='\r')
+    # Batch save to cache
+    if newly_fetched:
+        cache_manager.store_matches_batch(newly_fetched)
     
-    print(f"\n   ✅ Successfully fetched {len(results)}/{len(match_ids)} matches\n")
+    print(f"   ✅ Successfully fetched {len(results)}/{len(match_ids)} matches\n")
     
     return results
 
 
-async def _fetch_match_with_retry(match_id: str) -> Optional[Dict]:
-    """Fetch a single match with rate limiting."""
-    await rate_limiter.wait_if_needed()
-    
-    url = f"https://americas.api.riotgames.com/lol/match/v5/matches/{match_id}"
-    
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, headers=HEADERS)
-            rate_limiter.record_request()
-            
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 429:
-                retry_after = int(response.headers.get('Retry-After', 5))
-                await asyncio.sleep(retry_after)
-                # Don't retry to avoid infinite loops
-                return None
-    except:
-        pass
-    
-    return None
-
-
 # ========== DATA ANALYSIS ========== 
 
 
@@ -437,11 +460,13 @@ def build_match_deep_stats(match_data: Dict[str, Any], puuid: str) -> Optional[D
     """Build a detailed profile of a single match using general stats."""
     info = match_data.get('info', {})
     participants = info.get('participants', [])
-    player = next((p for p in participants if p.get('puuid') == puuid), None)
+    idx = find_participant_index(match_data, puuid)
 
-    if not player:
+    if idx is None:
         return None
 
+    player = participants[idx]
+
     metadata = match_data.get('metadata', {})
     match_id = metadata.get('matchId', 'unknown')
     duration_seconds = info.get('gameDuration', 0)
@@ -670,14 +695,69 @@ Respond ONLY in JSON format:
         }
 
 
+# Column dtypes for build_player_frame (keys match extract_comprehensive_player_data)
+# Stats need only a few significant digits, so counts are int32 and rates float32.
+PLAYER_FRAME_DTYPES = {
+    'timestamp': np.int64,  # epoch ms overflows int32
+    'champion': object,
+    'role': object,
+    'win': np.bool_,
+    'game_duration': np.float32,
+    'queue_id': np.int32,
+    'kills': np.int32,
+    'deaths': np.int32,
+    'assists': np.int32,
+    'kda': np.float32,
+    'solo_kills': np.int32,
+    # Per-game multikill counts are tiny; NumPy sums widen int8 to int64
+    'double_kills': np.int8,
+    'triple_kills': np.int8,
+    'quadra_kills': np.int8,
+    'penta_kills': np.int8,
+    'damage_dealt': np.int32,
+    'damage_per_min': np.float32,
+    'damage_taken': np.int32,
+    'team_damage_pct': np.float32,
+    'gold_earned': np.int32,
+    'gold_per_min': np.float32,
+    'cs_total': np.int32,
+    'cs_per_min': np.float32,
+    'vision_score': np.int32,
+    'vision_per_min': np.float32,
+    'control_wards': np.int32,
+    'wards_placed': np.int32,
+    'wards_killed': np.int32,
+    'turret_kills': np.int32,
+    'damage_to_objectives': np.int32,
+}
+
+
+def find_participant_index(match_data: Dict, puuid: str) -> Optional[int]:
+    """
+    Index of the player in info.participants, or None if absent.
+    
+    metadata.participants lists PUUIDs in the same order as info.participants,
+    so one list.index call replaces scanning the participant dicts.
+    """
+    try:
+        return match_data['metadata']['participants'].index(puuid)
+    except (KeyError, ValueError):
+        return None
+
+
+def extract_queue_id(match_data: Dict) -> int:
+    """Cheap path for categorization: read only the queue ID."""
+    return match_data['info']['queueId']
+
+
 def extract_comprehensive_player_data(match_data: Dict, puuid: str) -> Optional[Dict]:
     """Extract all relevant player stats from match."""
-    participants = match_data['info']['participants']
-    player = next((p for p in participants if p['puuid'] == puuid), None)
-    
-    if not player:
+    idx = find_participant_index(match_data, puuid)
+    if idx is None:
         return None
     
+    player = match_data['info']['participants'][idx]
+    
     challenges = player.get('challenges', {})
     game_duration = match_data['info']['gameDuration'] / 60  # minutes
     
@@ -726,80 +806,102 @@ def extract_comprehensive_player_data(match_data: Dict, puuid: str) -> Optional[
     }
 
 
-def calculate_performance_trends(matches_data: List[Dict], puuid: str) -> Dict[str, Any]:
+def build_player_frame(matches_data: List[Dict], puuid: str) -> pd.DataFrame:
     """
-    Calculate comprehensive performance metrics and trends.
+    Extract the player's stats from every match once, for all analyzers.
     
     Args:
         matches_data: List of match data
         puuid: Player's PUUID
     
     Returns:
-        Dictionary with performance analysis
+        DataFrame with one row per match the player appears in
     """
-    player_stats = []
+    # Struct-of-arrays: one preallocated column per stat, filled by row index
+    n = len(matches_data)
+    columns = {col: np.empty(n, dtype=dtype) for col, dtype in PLAYER_FRAME_DTYPES.items()}
     
+    row = 0
     for match in matches_data:
         stats = extract_comprehensive_player_data(match, puuid)
-        if stats:
-            player_stats.append(stats)
+        if not stats:
+            continue
+        
+        for col, values in columns.items():
+            values[row] = stats[col]
+        row += 1
     
-    if not player_stats:
-        return {"error": "No valid match data"}
+    return pd.DataFrame({col: values[:row] for col, values in columns.items()}, copy=False)
+
+
+def calculate_performance_trends(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Calculate comprehensive performance metrics and trends.
+    
+    Args:
+        df: Player frame from build_player_frame
     
-    df = pd.DataFrame(player_stats)
-    df = df.sort_values('timestamp')
+    Returns:
+        Dictionary with performance analysis
+    """
+    if df.empty:
+        return {"error": "No valid match data"}
     
     total_games = len(df)
     
+    # Plain NumPy reductions on the frame's column arrays
+    win = df['win'].to_numpy()
+    kda = df['kda'].to_numpy()
+    kills = df['kills'].to_numpy()
+    cs_per_min = df['cs_per_min'].to_numpy()
+    vision_per_min = df['vision_per_min'].to_numpy()
+    
     # Basic stats
     analysis = {
         'total_games': total_games,
-        'overall_win_rate': (df['win'].sum() / total_games * 100),
+        'overall_win_rate': float(win.sum() / total_games * 100),
         
         # Averages
-        'avg_kda': df['kda'].mean(),
-        'avg_kills': df['kills'].mean(),
-        'avg_deaths': df['deaths'].mean(),
-        'avg_assists': df['assists'].mean(),
-        'avg_cs_per_min': df['cs_per_min'].mean(),
-        'avg_vision_per_min': df['vision_per_min'].mean(),
-        'avg_damage_per_min': df['damage_per_min'].mean(),
-        'avg_gold_per_min': df['gold_per_min'].mean(),
+        'avg_kda': float(kda.mean()),
+        'avg_kills': float(kills.mean()),
+        'avg_deaths': float(df['deaths'].to_numpy().mean()),
+        'avg_assists': float(df['assists'].to_numpy().mean()),
+        'avg_cs_per_min': float(cs_per_min.mean()),
+        'avg_vision_per_min': float(vision_per_min.mean()),
+        'avg_damage_per_min': float(df['damage_per_min'].to_numpy().mean()),
+        'avg_gold_per_min': float(df['gold_per_min'].to_numpy().mean()),
         
         # Totals
-        'total_multikills': (
-            df['double_kills'].sum() + 
-            df['triple_kills'].sum() + 
-            df['quadra_kills'].sum() + 
-            df['penta_kills'].sum()
-        ),
-        'total_penta_kills': df['penta_kills'].sum(),
+        'total_multikills': int(df[MULTIKILL_COLUMNS].to_numpy().sum()),
+        'total_penta_kills': int(df['penta_kills'].to_numpy().sum()),
         
         # Best game
-        'best_kda': df['kda'].max(),
-        'highest_kills': df['kills'].max(),
+        'best_kda': float(kda.max()),
+        'highest_kills': int(kills.max()),
     }
     
     # Trend analysis (if enough games)
     if total_games >= 40:
-        first_half = df.iloc[:total_games//2]
-        second_half = df.iloc[total_games//2:]
+        # Only the four trend columns need chronological order
+        order = np.argsort(df['timestamp'].to_numpy(), kind='stable')
+        win, kda, cs_per_min, vision_per_min = (
+            win[order], kda[order], cs_per_min[order], vision_per_min[order]
+        )
+        half = total_games // 2
         
         analysis.update({
-            'first_half_wr': (first_half['win'].sum() / len(first_half) * 100),
-            'second_half_wr': (second_half['win'].sum() / len(second_half) * 100),
-            'kda_improvement': (second_half['kda'].mean() - first_half['kda'].mean()),
-            'cs_improvement': (second_half['cs_per_min'].mean() - first_half['cs_per_min'].mean()),
-            'vision_improvement': (second_half['vision_per_min'].mean() - first_half['vision_per_min'].mean()),
+            'first_half_wr': float(win[:half].mean() * 100),
+            'second_half_wr': float(win[half:].mean() * 100),
+            'kda_improvement': float(kda[half:].mean() - kda[:half].mean()),
+            'cs_improvement': float(cs_per_min[half:].mean() - cs_per_min[:half].mean()),
+            'vision_improvement': float(vision_per_min[half:].mean() - vision_per_min[:half].mean()),
             'has_trends': True
         })
     else:
         analysis['has_trends'] = False
     
     # Queue distribution
-    queue_counts = df['queue_id'].value_counts().to_dict()
-    ranked_games = sum(count for qid, count in queue_counts.items() if qid in RANKED_QUEUES)
+    ranked_games = int(np.isin(df['queue_id'].to_numpy(), list(RANKED_QUEUES)).sum())
     
     analysis['ranked_games'] = ranked_games
     analysis['ranked_percentage'] = (ranked_games / total_games * 100)
@@ -807,98 +909,95 @@ def calculate_performance_trends(matches_data: List[Dict], puuid: str) -> Dict[s
     return analysis
 
 
-def analyze_champion_pool(matches_data: List[Dict], puuid: str) -> Dict[str, Any]:
-    """Analyze champion preferences and performance."""
-    champion_stats = {}
-    role_stats = {}
+def analyze_champion_pool(df: pd.DataFrame) -> Dict[str, Any]:
+    """Analyze champion preferences and performance from the player frame."""
+    if df.empty:
+        return {
+            'total_unique_champions': 0,
+            'top_champions': [],
+            'role_distribution': {},
+            'primary_role': 'UNKNOWN',
+        }
     
-    for match in matches_data:
-        player_data = extract_comprehensive_player_data(match, puuid)
-        if not player_data:
-            continue
-        
-        champ = player_data['champion']
-        role = player_data['role']
-        win = player_data['win']
-        kda = player_data['kda']
-        
-        # Champion stats
-        if champ not in champion_stats:
-            champion_stats[champ] = {
-                'games': 0,
-                'wins': 0,
-                'total_kda': 0,
-                'roles': []
-            }
-        
-        champion_stats[champ]['games'] += 1
-        champion_stats[champ]['wins'] += 1 if win else 0
-        champion_stats[champ]['total_kda'] += kda
-        champion_stats[champ]['roles'].append(role)
-        
-        # Role stats
-        if role and role != 'NONE':
-            if role not in role_stats:
-                role_stats[role] = {'games': 0, 'wins': 0}
-            role_stats[role]['games'] += 1
-            role_stats[role]['wins'] += 1 if win else 0
-    
-    # Calculate final stats
-    for champ, stats in champion_stats.items():
-        stats['win_rate'] = (stats['wins'] / stats['games'] * 100) if stats['games'] > 0 else 0
-        stats['avg_kda'] = stats['total_kda'] / stats['games'] if stats['games'] > 0 else 0
-        stats['primary_role'] = max(set(stats['roles']), key=stats['roles'].count) if stats['roles'] else 'UNKNOWN'
-    
-    # Sort and format
-    top_champions = sorted(
-        champion_stats.items(),
-        key=lambda x: x[1]['games'],
-        reverse=True
-    )[:10]
+    # Champion stats
+    champion_stats = df.groupby('champion').agg(
+        games=('win', 'size'),
+        wins=('win', 'sum'),
+        avg_kda=('kda', 'mean'),
+    )
+    champion_stats['win_rate'] = champion_stats['wins'] / champion_stats['games'] * 100
+    
+    # Most played role per champion
+    champion_roles = (
+        df.groupby(['champion', 'role']).size()
+        .reset_index(name='count')
+        .sort_values('count', ascending=False, kind='stable')
+        .drop_duplicates('champion')
+        .set_index('champion')['role']
+    )
+    
+    top_champions = champion_stats.sort_values('games', ascending=False, kind='stable').head(10)
     
     # Role distribution
-    for role, stats in role_stats.items():
-        stats['win_rate'] = (stats['wins'] / stats['games'] * 100) if stats['games'] > 0 else 0
+    role_mask = (df['role'] != '') & (df['role'] != 'NONE') & df['role'].notna()
+    role_agg = df[role_mask].groupby('role').agg(
+        games=('win', 'size'),
+        wins=('win', 'sum'),
+    )
+    role_agg['win_rate'] = role_agg['wins'] / role_agg['games'] * 100
+    
+    role_stats = {
+        role: {
+            'games': int(row.games),
+            'wins': int(row.wins),
+            'win_rate': float(row.win_rate)
+        }
+        for role, row in zip(role_agg.index, role_agg.itertuples(index=False))
+    }
     
-    primary_role = max(role_stats.items(), key=lambda x: x[1]['games'])[0] if role_stats else 'UNKNOWN'
+    primary_role = role_agg['games'].idxmax() if not role_agg.empty else 'UNKNOWN'
     
     return {
         'total_unique_champions': len(champion_stats),
         'top_champions': [
             {
                 'name': champ,
-                'games': stats['games'],
-                'win_rate': stats['win_rate'],
-                'avg_kda': stats['avg_kda'],
-                'primary_role': stats['primary_role']
+                'games': int(row.games),
+                'win_rate': float(row.win_rate),
+                'avg_kda': float(row.avg_kda),
+                'primary_role': champion_roles.get(champ, 'UNKNOWN')
             }
-            for champ, stats in top_champions
+            for champ, row in zip(top_champions.index, top_champions.itertuples(index=False))
         ],
         'role_distribution': role_stats,
         'primary_role': primary_role,
     }
 
 
-def identify_playstyle_personality(matches_data: List[Dict], puuid: str) -> Dict[str, Any]:
-    """Determine player's unique playstyle personality."""
-    all_stats = []
-    
-    for match in matches_data:
-        player_data = extract_comprehensive_player_data(match, puuid)
-        if player_data:
-            all_stats.append(player_data)
-    
-    if not all_stats:
+# Playstyle traits in precedence order, with the threshold each score must exceed
+PLAYSTYLE_TRAITS = [
+    ("Duelist", "You thrive in 1v1 outplays and mechanical skill"),
+    ("Carry", "You consistently deal massive damage for your team"),
+    ("Vision Master", "Your map awareness and vision control are exceptional"),
+    ("Teamfight Monster", "You excel in coordinated 5v5 engagements"),
+    ("Consistent Performer", "Reliable and steady across all games"),
+]
+PLAYSTYLE_THRESHOLDS = np.array([60, 70, 70, 60, 4])
+FALLBACK_PLAYSTYLE_TRAIT = ("Adaptive Player", "Flexible playstyle that adjusts to team needs")
+
+
+def identify_playstyle_personality(df: pd.DataFrame) -> Dict[str, Any]:
+    """Determine player's unique playstyle personality from the player frame."""
+    if df.empty:
         return {"error": "No data"}
     
-    df = pd.DataFrame(all_stats)
-    
-    # Calculate personality scores
-    avg_solo_kills = df['solo_kills'].mean()
-    avg_team_damage = df['team_damage_pct'].mean()
-    avg_vision = df['vision_per_min'].mean()
-    avg_multikills = (df['double_kills'] + df['triple_kills'] + df['quadra_kills'] + df['penta_kills']).mean()
-    overall_kda = df['kda'].mean()
+    # Calculate personality scores (plain ndarray means, no pandas dispatch)
+    avg_solo_kills = float(df['solo_kills'].to_numpy().mean())
+    avg_team_damage = float(df['team_damage_pct'].to_numpy().mean())
+    avg_vision = float(df['vision_per_min'].to_numpy().mean())
+    multikills = df[MULTIKILL_COLUMNS].to_numpy().sum(axis=1)
+    avg_multikills = float(multikills.mean())
+    overall_kda = float(df['kda'].to_numpy().mean())
     
     personality = {
         'aggression_score': min(100, avg_solo_kills * 20),
@@ -908,25 +1007,20 @@ def identify_playstyle_personality(matches_data: List[Dict], puuid: str) -> Dict
         'overall_kda': overall_kda,
     }
     
-    # Determine primary personality
-    if personality['aggression_score'] > 60:
-        primary_trait = "Duelist"
-        description = "You thrive in 1v1 outplays and mechanical skill"
-    elif personality['carry_potential'] > 70:
-        primary_trait = "Carry"
-        description = "You consistently deal massive damage for your team"
-    elif personality['vision_mastery'] > 70:
-        primary_trait = "Vision Master"
-        description = "Your map awareness and vision control are exceptional"
-    elif personality['teamfight_prowess'] > 60:
-        primary_trait = "Teamfight Monster"
-        description = "You excel in coordinated 5v5 engagements"
-    elif overall_kda > 4:
-        primary_trait = "Consistent Performer"
-        description = "Reliable and steady across all games"
+    # Determine primary personality: the first trait, in PLAYSTYLE_TRAITS
+    # order, whose score clears its threshold
+    cleared = np.array([
+        personality['aggression_score'],
+        personality['carry_potential'],
+        personality['vision_mastery'],
+        personality['teamfight_prowess'],
+        overall_kda,
+    ]) > PLAYSTYLE_THRESHOLDS
+    
+    if cleared.any():
+        primary_trait, description = PLAYSTYLE_TRAITS[int(cleared.argmax())]
     else:
-        primary_trait = "Adaptive Player"
-        description = "Flexible playstyle that adjusts to team needs"
+        primary_trait, description = FALLBACK_PLAYSTYLE_TRAIT
     
     return {
         'primary_trait': primary_trait,
@@ -936,7 +1030,7 @@ def identify_playstyle_personality(matches_data: List[Dict], puuid: str) -> Dict
             'avg_solo_kills': avg_solo_kills,
             'avg_team_damage_pct': avg_team_damage,
             'avg_vision_per_min': avg_vision,
-            'total_multikills': df['double_kills'].sum() + df['triple_kills'].sum() + df['quadra_kills'].sum() + df['penta_kills'].sum()
+            'total_multikills': int(multikills.sum())
         }
     }
 
@@ -1004,66 +1098,93 @@ Narrative Summary:
         return f"AI analysis failed for match {match_id}."
 
 
+SKILL_SLOT_KEYS = {1: 'Q', 2: 'W', 3: 'E', 4: 'R'}
+
+
+def _on_skill_level_up(event: Dict[str, Any], participant_id: int, champions: Tuple[str, ...], minute: int) -> Optional[str]:
+    if event.get('participantId') == participant_id and event['levelUpType'] == 'NORMAL':
+        return f"[{minute}m] Leveled up {SKILL_SLOT_KEYS.get(event['skillSlot'], 'Skill')}"
+    return None
+
+
+def _on_item_purchased(event: Dict[str, Any], participant_id: int, champions: Tuple[str, ...], minute: int) -> Optional[str]:
+    if event.get('participantId') == participant_id:
+        return f"[{minute}m] Purchased an item."
+    return None
+
+
+def _on_champion_kill(event: Dict[str, Any], participant_id: int, champions: Tuple[str, ...], minute: int) -> Optional[str]:
+    killer_id = event.get('killerId', 0)
+    victim_id = event['victimId']
+    
+    if killer_id == participant_id:
+        return f"[{minute}m] KILLED {champions[victim_id]}"
+    if victim_id == participant_id:
+        return f"[{minute}m] DIED to {champions[killer_id]}"
+    if participant_id in event.get('assistingParticipantIds', ()):
+        return f"[{minute}m] ASSISTED in killing {champions[victim_id]}"
+    return None
+
+
+def _on_elite_monster_kill(event: Dict[str, Any], participant_id: int, champions: Tuple[str, ...], minute: int) -> Optional[str]:
+    if event.get('killerId', 0) == participant_id or participant_id in event.get('assistingParticipantIds', ()):
+        monster_type = event.get('monsterType', 'Monster').replace('_', ' ')
+        return f"[{minute}m] Helped take {monster_type}"
+    return None
+
+
+def _on_building_kill(event: Dict[str, Any], participant_id: int, champions: Tuple[str, ...], minute: int) -> Optional[str]:
+    if event.get('killerId', 0) == participant_id or participant_id in event.get('assistingParticipantIds', ()):
+        building_type = event.get('buildingType', 'Building').replace('_', ' ').title()
+        lane = event.get('laneType', '').replace('_LANE', '')
+        return f"[{minute}m] Helped destroy a {lane} {building_type}"
+    return None
+
+
+# Timeline event type -> formatter returning a log line (or None if not relevant)
+EVENT_LOG_HANDLERS = {
+    'SKILL_LEVEL_UP': _on_skill_level_up,
+    'ITEM_PURCHASED': _on_item_purchased,
+    'CHAMPION_KILL': _on_champion_kill,
+    'ELITE_MONSTER_KILL': _on_elite_monster_kill,
+    'BUILDING_KILL': _on_building_kill,
+}
+
+
 def _create_player_event_log(timeline: Dict[str, Any], participant_id: int) -> str:
     """
     Parses a raw match timeline and creates a simplified, human-readable log of events
     for a specific participant. This reduces the token count for the LLM.
     """
     event_log = []
+    append = event_log.append
+    last_message = None
     
-    # Get champion names for all participants for richer logs
-    participant_champions = {p['participantId']: p.get('championName', 'Unknown') for p in timeline['info']['participants']}
+    # Champion names indexed directly by participantId; slot 0 covers
+    # non-champion killers (minions, towers) which Riot reports as id 0
+    participants = sorted(timeline['info']['participants'], key=lambda p: p['participantId'])
+    participant_champions = ('Unknown',) + tuple(p.get('championName', 'Unknown') for p in participants)
 
     for frame in timeline['info']['frames']:
         for event in frame['events']:
-            timestamp_min = int(event['timestamp'] / 60000)
+            handler = EVENT_LOG_HANDLERS.get(event['type'])
+            if handler is None:
+                continue
             
-            # ITEM AND SKILL EVENTS (Simplified)
-            if event.get('participantId') == participant_id:
-                if event['type'] == 'SKILL_LEVEL_UP' and event['levelUpType'] == 'NORMAL':
-                    skill_map = {1: 'Q', 2: 'W', 3: 'E', 4: 'R'}
-                    event_log.append(f"[{timestamp_min}m] Leveled up {skill_map.get(event['skillSlot'], 'Skill')}")
-                elif event['type'] == 'ITEM_PURCHASED':
-                    event_log.append(f"[{timestamp_min}m] Purchased an item.")
-
-            # KILLS, DEATHS, ASSISTS
-            if event['type'] == 'CHAMPION_KILL':
-                killer_id = event.get('killerId', 0)
-                victim_id = event['victimId']
-                
-                assisting_ids = event.get('assistingParticipantIds', [])
-                
-                if killer_id == participant_id:
-                    victim_champ = participant_champions.get(victim_id, 'Unknown')
-                    event_log.append(f"[{timestamp_min}m] KILLED {victim_champ}")
-                elif victim_id == participant_id:
-                    killer_champ = participant_champions.get(killer_id, 'Unknown')
-                    event_log.append(f"[{timestamp_min}m] DIED to {killer_champ}")
-                elif participant_id in assisting_ids:
-                    victim_champ = participant_champions.get(victim_id, 'Unknown')
-                    event_log.append(f"[{timestamp_min}m] ASSISTED in killing {victim_champ}")
-
-            # OBJECTIVE EVENTS
-            if event['type'] in ['ELITE_MONSTER_KILL', 'BUILDING_KILL']:
-                killer_id = event.get('killerId', 0)
-                assisting_ids = event.get('assistingParticipantIds', [])
-                if killer_id == participant_id or participant_id in assisting_ids:
-                    if event['type'] == 'ELITE_MONSTER_KILL':
-                        monster_type = event.get('monsterType', 'Monster').replace('_', ' ')
-                        event_log.append(f"[{timestamp_min}m] Helped take {monster_type}")
-                    elif event['type'] == 'BUILDING_KILL':
-                        building_type = event.get('buildingType', 'Building').replace('_', ' ').title()
-                        lane = event.get('laneType', '').replace('_LANE', '')
-                        event_log.append(f"[{timestamp_min}m] Helped destroy a {lane} {building_type}")
-
-    # To keep the log concise, remove duplicate consecutive messages
-    if not event_log:
-        return ""
-        
-    deduplicated_log = [event_log[0]]
-    for i in range(1, len(event_log)):
-        # Only add if it's different from the last message
-        if event_log[i] != event_log[i-1]:
-            deduplicated_log.append(event_log[i])
+            # Most events involve other players; skip them before any formatting
+            if (
+                event.get('participantId') != participant_id
+                and event.get('killerId') != participant_id
+                and event.get('victimId') != participant_id
+                and participant_id not in event.get('assistingParticipantIds', ())
+            ):
+                continue
             
-    return "\n".join(deduplicated_log)
\ No newline at end of file
+            message = handler(event, participant_id, participant_champions, event['timestamp'] // 60000)
+            
+            # To keep the log concise, skip duplicate consecutive messages
+            if message and message != last_message:
+                append(message)
+                last_message = message
+
+    return "\n".join(event_log)
\ No newline at end of file
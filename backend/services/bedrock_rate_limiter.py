@@ -3,8 +3,7 @@ Rate limiter for AWS Bedrock API.
 Implements exponential backoff with jitter for throttling errors.
 """
 import asyncio
-from datetime import datetime
-from typing import List
+import random
 import time
 
 class BedrockRateLimiter:
@@ -20,6 +19,11 @@ class BedrockRateLimiter:
     MAX_REQUESTS_PER_SECOND = 3  # Conservative to avoid throttling
     MIN_REQUEST_INTERVAL = 0.35  # Minimum 350ms between requests
     
+    # Token bucket: refills at the stricter of the two limits above. A
+    # capacity of 1 keeps requests evenly spaced; raise it to allow bursts.
+    REFILL_RATE = min(MAX_REQUESTS_PER_SECOND, 1.0 / MIN_REQUEST_INTERVAL)
+    BUCKET_CAPACITY = 1.0
+    
     # Exponential backoff settings
     INITIAL_BACKOFF = 5.0  # Start with 5 second delay (increased from 2s)
     MAX_BACKOFF = 120.0  # Cap at 2 minutes (increased from 60s)
@@ -27,8 +31,10 @@ class BedrockRateLimiter:
     JITTER_FACTOR = 0.1  # Add ±10% jitter
     
     def __init__(self):
-        self.requests_last_second: List[datetime] = []
-        self.last_request_time: float = 0
+        # All times are time.monotonic() so wall-clock jumps can't skew limits
+        self.tokens = self.BUCKET_CAPACITY
+        self.last_refill = time.monotonic()
+        self.last_request_time: float = 0.0
         self.consecutive_throttles = 0
         self.current_backoff = self.INITIAL_BACKOFF
         self._lock = asyncio.Lock()
@@ -40,12 +46,10 @@ class BedrockRateLimiter:
         Args:
             is_retry: True if this is a retry after a throttling error
         """
-        async with self._lock:
-            now = datetime.now()
-            current_time = time.time()
-            
-            # If this is a retry after throttling, apply exponential backoff
-            if is_retry:
+        # Sleeps happen outside the lock so one waiter never blocks the others;
+        # the lock only guards reading and updating the shared state.
+        if is_retry:
+            async with self._lock:
                 self.consecutive_throttles += 1
                 wait_time = min(
                     self.current_backoff * (self.BACKOFF_MULTIPLIER ** (self.consecutive_throttles - 1)),
@@ -53,42 +57,41 @@ class BedrockRateLimiter:
                 )
                 
                 # Add jitter to avoid thundering herd
-                import random
-                jitter = wait_time * self.JITTER_FACTOR * (2 * random.random() - 1)
+                jitter = wait_time * random.uniform(-self.JITTER_FACTOR, self.JITTER_FACTOR)
                 wait_time = wait_time + jitter
-                
-                print(f"🔄 Bedrock throttled (attempt {self.consecutive_throttles}), backing off for {wait_time:.1f}s...")
-                await asyncio.sleep(wait_time)
                 self.current_backoff = wait_time
-                return
+                attempt = self.consecutive_throttles
             
-            # Reset throttle counter on successful request
-            if self.consecutive_throttles > 0 and (current_time - self.last_request_time) > 5:
-                self.consecutive_throttles = 0
-                self.current_backoff = self.INITIAL_BACKOFF
-            
-            # Clean up old timestamps
-            self.requests_last_second = [
-                ts for ts in self.requests_last_second 
-                if (now - ts).total_seconds() < 1
-            ]
-            
-            # Enforce minimum interval between requests
-            time_since_last = current_time - self.last_request_time
-            if time_since_last < self.MIN_REQUEST_INTERVAL:
-                wait_time = self.MIN_REQUEST_INTERVAL - time_since_last
-                await asyncio.sleep(wait_time)
+            print(f"🔄 Bedrock throttled (attempt {attempt}), backing off for {wait_time:.1f}s...")
+            await asyncio.sleep(wait_time)
+            return
+        
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                
+                # Reset throttle counter on successful request
+                if self.consecutive_throttles > 0 and (now - self.last_request_time) > 5:
+                    self.consecutive_throttles = 0
+                    self.current_backoff = self.INITIAL_BACKOFF
+                
+                self._refill(now)
+                
+                if self.tokens >= 1.0:
+                    # Take the token now so concurrent callers queue behind us
+                    self.tokens -= 1.0
+                    self.last_request_time = now
+                    return
+                
+                wait_time = (1.0 - self.tokens) / self.REFILL_RATE
             
-            # Check requests per second limit
-            if len(self.requests_last_second) >= self.MAX_REQUESTS_PER_SECOND:
-                print(f"⏳ Bedrock rate limit ({self.MAX_REQUESTS_PER_SECOND} req/s) approaching, pausing...")
-                await asyncio.sleep(1.1)  # Wait just over 1 second
-                # Clean again after waiting
-                now = datetime.now()
-                self.requests_last_second = [
-                    ts for ts in self.requests_last_second 
-                    if (now - ts).total_seconds() < 1
-                ]
+            await asyncio.sleep(wait_time)
+    
+    def _refill(self, now: float):
+        """Add tokens for the time elapsed since the last refill."""
+        elapsed = now - self.last_refill
+        self.tokens = min(self.BUCKET_CAPACITY, self.tokens + elapsed * self.REFILL_RATE)
+        self.last_refill = now
     
     def record_request(self, success: bool = True):
         """
@@ -97,9 +100,7 @@ class BedrockRateLimiter:
         Args:
             success: Whether the request was successful (not throttled)
         """
-        now = datetime.now()
-        self.last_request_time = time.time()
-        self.requests_last_second.append(now)
+        self.last_request_time = time.monotonic()
         
         # Reset throttle counter on success
         if success and self.consecutive_throttles > 0:
@@ -113,16 +114,11 @@ class BedrockRateLimiter:
     
     def get_stats(self) -> dict:
         """Get current rate limit usage."""
-        now = datetime.now()
-        
-        recent_second = [
-            ts for ts in self.requests_last_second 
-            if (now - ts).total_seconds() < 1
-        ]
+        self._refill(time.monotonic())
         
         return {
-            "requests_last_second": len(recent_second),
-            "capacity_1s": f"{len(recent_second)}/{self.MAX_REQUESTS_PER_SECOND}",
+            "tokens_available": round(self.tokens, 2),
+            "refill_rate": f"{self.REFILL_RATE:.2f}/s",
             "consecutive_throttles": self.consecutive_throttles,
             "current_backoff": f"{self.current_backoff:.1f}s"
         }
@@ -2,51 +2,358 @@
 JSON-based cache manager for match data.
 Stores matches locally to avoid re-fetching from Riot API.
 """
-import json
+import asyncio
+import atexit
+import heapq
 import os
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, List
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Set, Tuple
 from pathlib import Path
 
+import orjson
+
+# ciso8601 is much faster for the one-time ISO cached_at migration, if installed
+try:
+    from ciso8601 import parse_datetime as _parse_iso
+except ImportError:
+    _parse_iso = datetime.fromisoformat
+
 class CacheManager:
     """
-    Simple JSON file-based cache for match data.
+    Simple JSONL file-based cache for match data.
     Perfect for hackathon/testing - no database needed!
+    
+    Each cache file is an append-only log of {"id", "data", "cached_at"}
+    (cached_at is an epoch float)
+    lines; on load the last line per id wins, and the log is compacted
+    once it grows past COMPACT_RATIO times the number of live entries.
+    
+    The dicts are only touched from the event loop. Flushing snapshots them
+    there and hands just the file I/O (fsync, compaction) to a worker thread;
+    _io_lock guards the append handles against that thread.
     """
     
+    # Appends are buffered and fsync'd at most this often
+    FLUSH_INTERVAL = 5.0
+    
+    # Match payloads can carry numpy scalars from the analysis helpers
+    DUMP_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    
+    # Write buffer for the append logs and compaction rewrites
+    LOG_BUFFER_SIZE = 256 * 1024
+    
+    # Rewrite a log when it holds more than this many lines per live entry
+    COMPACT_RATIO = 2
+    
     def __init__(self, cache_dir: str = "cache"):
         """Initialize cache manager with directory."""
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
         
         # Cache files
-        self.matches_file = self.cache_dir / "matches.json"
-        self.profiles_file = self.cache_dir / "profiles.json"
+        self.matches_file = self.cache_dir / "matches.jsonl"
+        self.profiles_file = self.cache_dir / "profiles.jsonl"
+        
+        # Open append handles, plus number of lines and bytes in each log
+        # (tracked on every write so stats never touch the filesystem)
+        self._io_lock = threading.Lock()
+        self._log_handles = {}
+        self._log_lines = {}
+        self._log_bytes = {}
+        
+        # Logs being compacted -> lines appended since their snapshot, which
+        # the compaction writes after the snapshot before swapping files
+        self._compacting: Dict[Path, List[bytes]] = {}
+        
+        # Logs with appends not yet fsync'd / logs that must be rewritten,
+        # handled by _maybe_flush or run_flusher
+        self._dirty_logs: Set[Path] = set()
+        self._compact_requested: Set[Path] = set()
+        self._flusher_running = False
+        
+        # Logs whose legacy JSON file has not been rewritten as JSONL yet
+        self._unmigrated: Set[Path] = set()
         
         # Load existing caches
         self.matches_cache = self._load_cache(self.matches_file)
         self.profiles_cache = self._load_cache(self.profiles_file)
         
+        # (cached_at, match_id) min-heap for clear_stale_data; entries whose
+        # cached_at no longer matches the cache are skipped lazily
+        self._expiry_heap: List[Tuple[float, str]] = [
+            (entry['cached_at'], match_id) for match_id, entry in self.matches_cache.items()
+        ]
+        heapq.heapify(self._expiry_heap)
+        
+        self._compact_requested |= self._unmigrated
+        self._dirty_logs |= self._unmigrated
+        self._last_flush = time.monotonic()
+        atexit.register(self.flush)
+        
         print(f"📦 Cache initialized: {len(self.matches_cache)} matches, {len(self.profiles_cache)} profiles")
     
     def _load_cache(self, file_path: Path) -> Dict:
-        """Load cache from JSON file."""
-        if file_path.exists():
+        """Load cache from a JSONL log, migrating a legacy JSON file if present."""
+        if not file_path.exists():
+            legacy_path = file_path.with_suffix('.json')
+            if not legacy_path.exists():
+                self._log_lines[file_path] = 0
+                self._log_bytes[file_path] = 0
+                return {}
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                with open(legacy_path, 'rb') as f:
+                    cache = orjson.loads(f.read())
             except Exception as e:
-                print(f"⚠️  Failed to load cache {file_path}: {e}")
+                # Leave the legacy file alone so the next start can retry
+                print(f"⚠️  Failed to load cache {legacy_path}: {e}")
+                self._log_lines[file_path] = 0
+                self._log_bytes[file_path] = 0
                 return {}
-        return {}
+            self._migrate_cached_at(cache)
+            if not self._save_cache(cache, file_path):
+                # No .jsonl exists yet, so the next start would retry the
+                # legacy file; keep appends off disk and retry on each flush
+                self._unmigrated.add(file_path)
+                self._log_lines[file_path] = 0
+                self._log_bytes[file_path] = 0
+            return cache
+        
+        cache = {}
+        lines = 0
+        size = 0
+        torn = False
+        try:
+            # Stream line by line so only one entry's bytes are held at a time
+            with open(file_path, 'rb', buffering=self.LOG_BUFFER_SIZE) as f:
+                for line in f:
+                    size += len(line)
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = orjson.loads(line)
+                        key = entry.pop('id')
+                    except (orjson.JSONDecodeError, AttributeError, KeyError, TypeError):
+                        # Torn final line from an interrupted write, or an
+                        # entry that isn't an object with an id; skip just it
+                        torn = True
+                        continue
+                    cache[key] = entry
+                    lines += 1
+        except Exception as e:
+            print(f"⚠️  Failed to load cache {file_path}: {e}")
+        self._log_lines[file_path] = lines
+        self._log_bytes[file_path] = size
+        migrated = self._migrate_cached_at(cache)
+        if torn or migrated:
+            # Rewrite so new appends don't land on the end of a torn line and
+            # converted timestamps are only parsed once
+            self._save_cache(cache, file_path)
+        return cache
+    
+    @staticmethod
+    def _migrate_cached_at(cache: Dict) -> int:
+        """
+        Convert ISO-string cached_at values from older caches to epoch floats.
+        
+        Returns:
+            Number of entries that were converted
+        """
+        migrated = 0
+        for entry in cache.values():
+            cached_at = entry.get('cached_at')
+            if isinstance(cached_at, float):
+                continue
+            if isinstance(cached_at, str):
+                try:
+                    entry['cached_at'] = _parse_iso(cached_at).timestamp()
+                except ValueError:
+                    entry['cached_at'] = 0.0
+            else:
+                entry['cached_at'] = float(cached_at or 0.0)
+            migrated += 1
+        return migrated
+    
+    def _cache_for(self, file_path: Path) -> Dict:
+        return self.matches_cache if file_path == self.matches_file else self.profiles_cache
+    
+    def _save_cache(self, data: Dict, file_path: Path) -> bool:
+        """Compact a cache log synchronously by rewriting it from the dict."""
+        return self._compact(file_path, self._snapshot_for_compaction(file_path, data))
+    
+    def _snapshot_for_compaction(self, file_path: Path, data: Dict) -> List[Tuple[str, Dict]]:
+        """
+        Snapshot a cache dict and park its log for compaction.
+        
+        Must run on the thread that owns the dict (the event loop). Appends
+        made until _compact finishes are queued instead of written.
+        """
+        snapshot = list(data.items())
+        with self._io_lock:
+            self._close_log_locked(file_path)
+            self._compacting[file_path] = []
+        return snapshot
     
-    def _save_cache(self, data: Dict, file_path: Path):
-        """Save cache to JSON file."""
+    def _compact(self, file_path: Path, snapshot: List[Tuple[str, Dict]]) -> bool:
+        """Rewrite a log from a snapshot via tmp + os.replace; thread-safe."""
+        tmp_path = file_path.with_suffix('.jsonl.tmp')
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, default=str)
+            payload = b"".join(
+                orjson.dumps({'id': key, **entry}, option=self.DUMP_OPTIONS) + b"\n"
+                for key, entry in snapshot
+            )
+            f = open(tmp_path, 'wb', buffering=self.LOG_BUFFER_SIZE)
+            try:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+                
+                with self._io_lock:
+                    pending = self._compacting[file_path]
+                    if pending:
+                        f.write(b"".join(pending))
+                        f.flush()
+                        os.fsync(f.fileno())
+                    # Windows can't replace a file that is still open
+                    f.close()
+                    os.replace(tmp_path, file_path)
+                    del self._compacting[file_path]
+                    self._unmigrated.discard(file_path)
+                    self._log_lines[file_path] = len(snapshot) + len(pending)
+                    self._log_bytes[file_path] = len(payload) + sum(map(len, pending))
+            finally:
+                f.close()
+            return True
         except Exception as e:
             print(f"⚠️  Failed to save cache {file_path}: {e}")
+            with self._io_lock:
+                # Keep the old log, plus whatever was appended meanwhile
+                pending = self._compacting.pop(file_path, None)
+                if pending:
+                    try:
+                        with open(file_path, 'ab') as log:
+                            log.write(b"".join(pending))
+                    except Exception as append_error:
+                        print(f"⚠️  Failed to save cache {file_path}: {append_error}")
+            return False
+    
+    def _append(self, file_path: Path, key: str, entry: Dict[str, Any]):
+        """Append one entry to a cache log (queued while it is compacting)."""
+        line = orjson.dumps({'id': key, **entry}, option=self.DUMP_OPTIONS) + b"\n"
+        with self._io_lock:
+            if file_path in self._unmigrated:
+                # The dict holds the entry; the retried migration writes it
+                return
+            pending = self._compacting.get(file_path)
+            if pending is not None:
+                pending.append(line)
+            else:
+                f = self._log_handles.get(file_path)
+                if f is None:
+                    f = open(file_path, 'ab', buffering=self.LOG_BUFFER_SIZE)
+                    self._log_handles[file_path] = f
+                f.write(line)
+            self._log_lines[file_path] = self._log_lines.get(file_path, 0) + 1
+            self._log_bytes[file_path] = self._log_bytes.get(file_path, 0) + len(line)
+    
+    def _close_log_locked(self, file_path: Path):
+        """Close a log's append handle (caller holds _io_lock)."""
+        f = self._log_handles.pop(file_path, None)
+        if f is not None:
+            f.close()
+    
+    def _sync_log(self, file_path: Path) -> bool:
+        """fsync a log's pending appends; thread-safe."""
+        try:
+            with self._io_lock:
+                f = self._log_handles.get(file_path)
+                if f is None:
+                    return True
+                f.flush()
+                fd = os.dup(f.fileno())
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            return True
+        except Exception as e:
+            print(f"⚠️  Failed to flush cache {file_path}: {e}")
+            return False
+    
+    def _mark_dirty(self, file_path: Path):
+        self._dirty_logs.add(file_path)
+        self._maybe_flush()
+    
+    def _plan_flush(self) -> List[Tuple[Path, Optional[List[Tuple[str, Dict]]]]]:
+        """
+        Collect (file_path, snapshot) jobs for dirty logs on the event loop.
+        
+        snapshot is None for a plain fsync. Logs still being compacted by an
+        earlier flush stay dirty for the next one.
+        """
+        jobs = []
+        for file_path in list(self._dirty_logs):
+            if file_path in self._compacting:
+                continue
+            self._dirty_logs.discard(file_path)
+            
+            data = self._cache_for(file_path)
+            if (file_path in self._compact_requested or
+                    self._log_lines.get(file_path, 0) > self.COMPACT_RATIO * max(len(data), 1)):
+                self._compact_requested.discard(file_path)
+                jobs.append((file_path, self._snapshot_for_compaction(file_path, data)))
+            else:
+                jobs.append((file_path, None))
+        return jobs
+    
+    def _run_flush(self, jobs: List[Tuple[Path, Optional[List[Tuple[str, Dict]]]]]):
+        """Do the file I/O for planned flush jobs; safe in a worker thread."""
+        for file_path, snapshot in jobs:
+            if snapshot is None:
+                ok = self._sync_log(file_path)
+            else:
+                ok = self._compact(file_path, snapshot)
+                if not ok:
+                    self._compact_requested.add(file_path)
+            if not ok:
+                # Retry on the next flush
+                self._dirty_logs.add(file_path)
+    
+    def flush(self):
+        """Persist any pending cache appends to disk (blocking)."""
+        self._run_flush(self._plan_flush())
+        self._last_flush = time.monotonic()
+    
+    async def flush_async(self):
+        """Persist pending cache appends, doing the file I/O off the event loop."""
+        jobs = self._plan_flush()
+        if jobs:
+            await asyncio.to_thread(self._run_flush, jobs)
+        self._last_flush = time.monotonic()
+    
+    def _maybe_flush(self):
+        """
+        Flush inline if the last write is older than FLUSH_INTERVAL.
+        
+        Skipped while run_flusher is active, so stores made from request
+        handlers never fsync or compact on the event loop.
+        """
+        if self._flusher_running:
+            return
+        if time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL:
+            self.flush()
+    
+    async def run_flusher(self):
+        """Background task: persist dirty caches every FLUSH_INTERVAL seconds."""
+        self._flusher_running = True
+        try:
+            while True:
+                await asyncio.sleep(self.FLUSH_INTERVAL)
+                if self._dirty_logs:
+                    await self.flush_async()
+        finally:
+            self._flusher_running = False
     
     def get_match(self, match_id: str, max_age_hours: int = 24) -> Optional[Dict[str, Any]]:
         """
@@ -63,9 +370,8 @@ class CacheManager:
             return None
         
         cached = self.matches_cache[match_id]
-        cached_time = datetime.fromisoformat(cached.get('cached_at', '2000-01-01'))
         
-        if datetime.now() - cached_time > timedelta(hours=max_age_hours):
+        if time.time() - cached['cached_at'] > max_age_hours * 3600:
             # Stale cache
             return None
         
@@ -73,20 +379,27 @@ class CacheManager:
     
     def store_match(self, match_id: str, match_data: Dict[str, Any]):
         """Store match data in cache."""
-        self.matches_cache[match_id] = {
+        entry = {
             'data': match_data,
-            'cached_at': datetime.now().isoformat()
+            'cached_at': time.time()
         }
-        self._save_cache(self.matches_cache, self.matches_file)
+        self.matches_cache[match_id] = entry
+        heapq.heappush(self._expiry_heap, (entry['cached_at'], match_id))
+        self._append(self.matches_file, match_id, entry)
+        self._mark_dirty(self.matches_file)
     
     def store_matches_batch(self, matches: Dict[str, Dict[str, Any]]):
         """Store multiple matches at once (more efficient)."""
+        now = time.time()
         for match_id, match_data in matches.items():
-            self.matches_cache[match_id] = {
+            entry = {
                 'data': match_data,
-                'cached_at': datetime.now().isoformat()
+                'cached_at': now
             }
-        self._save_cache(self.matches_cache, self.matches_file)
+            self.matches_cache[match_id] = entry
+            heapq.heappush(self._expiry_heap, (now, match_id))
+            self._append(self.matches_file, match_id, entry)
+        self._mark_dirty(self.matches_file)
     
     def get_profile(self, puuid: str, max_age_hours: int = 1) -> Optional[Dict[str, Any]]:
         """Get cached profile data (profiles change frequently, shorter TTL)."""
@@ -94,57 +407,76 @@ class CacheManager:
             return None
         
         cached = self.profiles_cache[puuid]
-        cached_time = datetime.fromisoformat(cached.get('cached_at', '2000-01-01'))
         
-        if datetime.now() - cached_time > timedelta(hours=max_age_hours):
+        if time.time() - cached['cached_at'] > max_age_hours * 3600:
             return None
         
         return cached.get('data')
     
     def store_profile(self, puuid: str, profile_data: Dict[str, Any]):
         """Store profile data in cache."""
-        self.profiles_cache[puuid] = {
+        entry = {
             'data': profile_data,
-            'cached_at': datetime.now().isoformat()
+            'cached_at': time.time()
         }
-        self._save_cache(self.profiles_cache, self.profiles_file)
+        self.profiles_cache[puuid] = entry
+        self._append(self.profiles_file, puuid, entry)
+        self._mark_dirty(self.profiles_file)
+    
+    def store_profiles_batch(self, profiles: Dict[str, Dict[str, Any]]):
+        """Store multiple profiles at once (more efficient)."""
+        now = time.time()
+        for puuid, profile_data in profiles.items():
+            entry = {
+                'data': profile_data,
+                'cached_at': now
+            }
+            self.profiles_cache[puuid] = entry
+            self._append(self.profiles_file, puuid, entry)
+        self._mark_dirty(self.profiles_file)
     
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics."""
-        now = datetime.now()
+        fresh_cutoff = time.time() - 24 * 3600
         
         # Count fresh matches (< 24h old)
         fresh_matches = sum(
             1 for cached in self.matches_cache.values()
-            if now - datetime.fromisoformat(cached.get('cached_at', '2000-01-01')) < timedelta(hours=24)
+            if cached['cached_at'] > fresh_cutoff
         )
         
         return {
             'total_matches': len(self.matches_cache),
             'fresh_matches': fresh_matches,
             'total_profiles': len(self.profiles_cache),
-            'cache_size_mb': sum(
-                os.path.getsize(f) for f in [self.matches_file, self.profiles_file]
-                if f.exists()
-            ) / (1024 * 1024)
+            'cache_size_mb': self._get_cache_size_mb()
         }
     
+    def _get_cache_size_mb(self) -> float:
+        """Get cache log size from the byte counts tracked on every write."""
+        return sum(self._log_bytes.values()) / (1024 * 1024)
+    
     def clear_stale_data(self, max_age_days: int = 7):
         """Remove data older than X days to keep cache size reasonable."""
-        now = datetime.now()
-        cutoff = now - timedelta(days=max_age_days)
-        
-        # Clear old matches
-        old_count = len(self.matches_cache)
-        self.matches_cache = {
-            k: v for k, v in self.matches_cache.items()
-            if datetime.fromisoformat(v.get('cached_at', '2000-01-01')) > cutoff
-        }
-        removed = old_count - len(self.matches_cache)
+        cutoff = time.time() - max_age_days * 86400
+        
+        # Clear old matches, popping only the expired head of the heap
+        heap = self._expiry_heap
+        removed = 0
+        while heap and heap[0][0] <= cutoff:
+            cached_at, match_id = heapq.heappop(heap)
+            entry = self.matches_cache.get(match_id)
+            if entry is not None and entry['cached_at'] == cached_at:
+                del self.matches_cache[match_id]
+                removed += 1
         
         if removed > 0:
             print(f"🧹 Removed {removed} stale matches (older than {max_age_days} days)")
-            self._save_cache(self.matches_cache, self.matches_file)
+            # Dropped ids only disappear from the log once it is rewritten
+            self._compact_requested.add(self.matches_file)
+            self._mark_dirty(self.matches_file)
 
-# Global cache instance
-cache_manager = CacheManager(cache_dir=os.path.join(os.path.dirname(__file__), '..', 'cache'))
+# Global cache instance (CACHE_DIR lets tests keep it off backend/cache)
+cache_manager = CacheManager(
+    cache_dir=os.getenv("CACHE_DIR", os.path.join(os.path.dirname(__file__), '..', 'cache'))
+)
@@ -28,14 +28,31 @@ class Config:
     CACHE_MATCH_TTL_HOURS: int = 24
     CACHE_PROFILE_TTL_HOURS: int = 1
     
+    # Concurrency
+    MAX_CONCURRENT_ANALYSES: int = 4
+    
+    # Result of the last validate(), reused so health checks don't re-read
+    # the environment; startup refreshes it
+    _validation: Optional[tuple[bool, Optional[str]]] = None
+    
     @classmethod
-    def validate(cls) -> tuple[bool, Optional[str]]:
+    def validate(cls, refresh: bool = False) -> tuple[bool, Optional[str]]:
         """
         Validate that all required environment variables are set.
         
+        Args:
+            refresh: Re-read the environment instead of reusing the last result
+        
         Returns:
             (is_valid, error_message)
         """
+        if cls._validation is None or refresh:
+            cls._validation = cls._read_env()
+        return cls._validation
+    
+    @classmethod
+    def _read_env(cls) -> tuple[bool, Optional[str]]:
+        """Read and validate the environment, setting class attributes."""
         required_vars = {
             'RIOT_API_KEY': 'Riot API Key',
             'AWS_ACCESS_KEY_ID': 'AWS Access Key ID',
@@ -70,6 +87,7 @@ class Config:
         
         # Optional settings
         cls.ENABLE_CACHE = os.getenv('ENABLE_CACHE', 'true').lower() == 'true'
+        cls.MAX_CONCURRENT_ANALYSES = int(os.getenv('MAX_CONCURRENT_ANALYSES', '4'))
         
         return True, None
     
@@ -83,6 +101,7 @@ class Config:
    Region: {cls.AWS_REGION}
    Cache: {'Enabled' if cls.ENABLE_CACHE else 'Disabled'}
    Rate Limits: {cls.RIOT_RATE_LIMIT_PER_SECOND}/s, {cls.RIOT_RATE_LIMIT_PER_2MIN}/2min
+   Max Concurrent Analyses: {cls.MAX_CONCURRENT_ANALYSES}
 """
 
 # Validate on module import
@@ -0,0 +1,43 @@
+"""
+Structured logging for request handlers.
+Records are queued by the handler and written to stderr as JSON lines by a
+background listener thread, so log I/O never blocks the event loop.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+
+import orjson
+
+
+class JSONFormatter(logging.Formatter):
+    """Format log records as single-line JSON objects."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry).decode()
+
+
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+
+_stream_handler = logging.StreamHandler(sys.stderr)
+_stream_handler.setFormatter(JSONFormatter())
+
+_listener = logging.handlers.QueueListener(_log_queue, _stream_handler)
+_listener.start()
+atexit.register(_listener.stop)
+
+# Global application logger
+logger = logging.getLogger("riftrewind")
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+logger.propagate = False
@@ -2,36 +2,77 @@
 Profile Service - Player profile, rank, and summoner data
 Fetches core player information for North American players.
 """
-import os
-import httpx
 import asyncio
-from typing import Optional, Dict, Any, List
-from dotenv import load_dotenv
-from .rate_limiter import rate_limiter
-
-load_dotenv()
-RIOT_API_KEY = os.getenv("RIOT_API_KEY")
-HEADERS = {"X-Riot-Token": RIOT_API_KEY}
+import time
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Optional, Dict, Any, List, Tuple
+import orjson
+from .http_client import get_client
+from .cache_manager import cache_manager
+from . import riot_api
 
 # Data Dragon version
 DD_VERSION = "14.22.1"
 DD_BASE_URL = f"https://ddragon.leagueoflegends.com/cdn/{DD_VERSION}"
 
+# Data Dragon versions tried in order when validating a profile icon
+PROFILE_ICON_VERSIONS = tuple(dict.fromkeys([DD_VERSION, "14.23.1", "14.22.1", "latest"]))
+DEFAULT_PROFILE_ICON_ID = 29
+
 # Role display names
-ROLE_DISPLAY = {
+ROLE_DISPLAY = MappingProxyType({
     "TOP": "Top",
     "JUNGLE": "Jungle",
     "MIDDLE": "Mid",
     "BOTTOM": "ADC",
     "UTILITY": "Support",
     "NONE": "Fill"
-}
+})
+
+# Successful profiles are reused briefly so refresh storms don't re-hit Riot.
+# (game_name, tag_line) lowercased -> (expires_at, result)
+PROFILE_CACHE_TTL_SECONDS = 300
+PROFILE_CACHE_MAX_SIZE = 1000
+_profile_cache: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+
+# Profile lookups currently running, so concurrent callers share one
+_inflight_profiles: Dict[Tuple[str, str], asyncio.Future] = {}
+
+# Summoner level/icon change at most a few times a day.
+# (platform, puuid) -> (expires_at, summoner)
+SUMMONER_CACHE_TTL_SECONDS = 3600
+SUMMONER_CACHE_MAX_SIZE = 10000
+_summoner_cache: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+
+# Player's teamPosition per finished match, which never changes.
+# (match_id, puuid) -> teamPosition
+ROLE_CACHE_MAX_SIZE = 50000
+_role_cache: Dict[Tuple[str, str], str] = {}
+
+
+# Icon URLs that passed the Data Dragon HEAD check, keyed by icon ID
+_validated_icon_urls: Dict[int, str] = {}
+
+
+@lru_cache(maxsize=4096)
+def _icon_url(icon_id: int, version: str = DD_VERSION) -> str:
+    """Data Dragon profile icon URL (icon IDs are a small, repeating set)."""
+    return f"https://ddragon.leagueoflegends.com/cdn/{version}/img/profileicon/{icon_id}.png"
+
+
+def _json(response) -> Any:
+    """Parse a response body with orjson."""
+    return orjson.loads(response.content)
 
 
 async def get_player_profile(game_name: str, tag_line: str) -> Dict[str, Any]:
     """
     Get complete player profile including summoner data, rank, and main role.
     
+    Identical concurrent requests share one lookup, and successful results
+    are cached for PROFILE_CACHE_TTL_SECONDS.
+    
     Args:
         game_name: Player name (before #)
         tag_line: Tag (after #)
@@ -39,6 +80,56 @@ async def get_player_profile(game_name: str, tag_line: str) -> Dict[str, Any]:
     Returns:
         Dictionary with profile data or error
     """
+    key = (game_name.lower(), tag_line.lower())
+    
+    cached = _profile_cache.get(key)
+    if cached:
+        expires_at, result = cached
+        if time.monotonic() < expires_at:
+            return _with_riot_id(result, game_name, tag_line)
+        del _profile_cache[key]
+    
+    pending = _inflight_profiles.get(key)
+    if pending is not None:
+        # Shield so one cancelled waiter doesn't cancel the shared lookup
+        return _with_riot_id(await asyncio.shield(pending), game_name, tag_line)
+    
+    future = asyncio.get_running_loop().create_future()
+    _inflight_profiles[key] = future
+    
+    try:
+        result = await _fetch_player_profile(game_name, tag_line)
+        if result.get("success"):
+            if len(_profile_cache) >= PROFILE_CACHE_MAX_SIZE:
+                # Evict the oldest entry (dicts keep insertion order)
+                del _profile_cache[next(iter(_profile_cache))]
+            _profile_cache[key] = (time.monotonic() + PROFILE_CACHE_TTL_SECONDS, result)
+        future.set_result(result)
+        return result
+    finally:
+        if not future.done():
+            future.set_result({
+                "success": False,
+                "error": "Profile lookup was cancelled"
+            })
+        _inflight_profiles.pop(key, None)
+
+
+def _with_riot_id(result: Dict[str, Any], game_name: str, tag_line: str) -> Dict[str, Any]:
+    """
+    Copy a shared profile result with the Riot ID cased as this caller wrote it.
+    
+    Profiles are shared case-insensitively, so the stored display fields
+    carry whichever casing the first caller used.
+    """
+    if not result.get("success"):
+        return result
+    riot_id = f"{game_name}#{tag_line}"
+    return {**result, "profile": {**result["profile"], "riot_id": riot_id, "display_name": riot_id}}
+
+
+async def _fetch_player_profile(game_name: str, tag_line: str) -> Dict[str, Any]:
+    """Run the full Riot lookup chain behind get_player_profile."""
     try:
         print(f"\n{'='*60}")
         print(f"📋 Fetching profile for {game_name}#{tag_line}")
@@ -58,8 +149,13 @@ async def get_player_profile(game_name: str, tag_line: str) -> Dict[str, Any]:
         
         print(f"✓ PUUID: {puuid[:20]}...")
         
-        # Step 2: Get summoner data (for icon, level)
-        summoner = await _get_summoner_by_puuid(puuid, platform)
+        # Steps 2-4 only need the PUUID: summoner data (for icon, level),
+        # rank, and recent match IDs for the main role
+        summoner, rank, match_ids = await asyncio.gather(
+            _get_summoner_by_puuid(puuid, platform),
+            _get_summoner_rank(puuid, platform),
+            _fetch_recent_match_ids(puuid, region)
+        )
         if not summoner:
             return {
                 "success": False,
@@ -67,17 +163,13 @@ async def get_player_profile(game_name: str, tag_line: str) -> Dict[str, Any]:
             }
         
         print(f"✓ Summoner Level: {summoner['summonerLevel']}")
-        
-        # Step 2.5: Validate and get profile icon URL with fallback
-        profile_icon_url = await _get_profile_icon_url(summoner['profileIconId'])
-        
-        # Step 3: Get rank
-        rank = await _get_summoner_rank(puuid, platform)
-        
         print(f"✓ Rank: {rank['display']}")
         
-        # Step 4: Determine main role from recent matches
-        main_role = await _determine_main_role(puuid, region, platform)
+        # Step 5: Validate the profile icon URL while tallying roles
+        profile_icon_url, main_role = await asyncio.gather(
+            _get_profile_icon_url(summoner['profileIconId']),
+            _aggregate_roles(match_ids, puuid)
+        )
         
         print(f"✓ Main Role: {main_role}")
         print(f"\n{'='*60}")
@@ -110,47 +202,56 @@ async def get_player_profile(game_name: str, tag_line: str) -> Dict[str, Any]:
 
 async def _get_puuid(game_name: str, tag_line: str, region: str = "americas") -> Optional[str]:
     """Get player PUUID from Riot ID."""
-    url = f"https://{region}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{game_name}/{tag_line}"
+    if region == "americas":
+        # Shares riot_api's PUUID cache with the player/analysis endpoints
+        return await riot_api.get_puuid_by_riot_id(game_name, tag_line)
     
-    await rate_limiter.wait_if_needed()
+    url = f"https://{region}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{game_name}/{tag_line}"
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(url, headers=HEADERS)
-            rate_limiter.record_request()
-            
-            if response.status_code == 200:
-                return response.json().get("puuid")
-            elif response.status_code == 404:
-                return None
-            else:
-                print(f"Error fetching PUUID: {response.status_code}")
-                return None
-        except Exception as e:
-            print(f"Exception fetching PUUID: {e}")
+    try:
+        response = await riot_api.request_with_retry(url)
+        
+        if response.status_code == 200:
+            return _json(response).get("puuid")
+        elif response.status_code == 404:
+            return None
+        else:
+            print(f"Error fetching PUUID: {response.status_code}")
             return None
+    except Exception as e:
+        print(f"Exception fetching PUUID: {e}")
+        return None
 
 
 async def _get_summoner_by_puuid(puuid: str, platform: str = "na1") -> Optional[Dict[str, Any]]:
-    """Get summoner data from PUUID."""
-    url = f"https://{platform}.api.riotgames.com/lol/summoner/v4/summoners/by-puuid/{puuid}"
+    """Get summoner data from PUUID, using the in-process TTL cache."""
+    key = (platform, puuid)
     
-    await rate_limiter.wait_if_needed()
+    cached = _summoner_cache.get(key)
+    if cached:
+        expires_at, summoner = cached
+        if time.monotonic() < expires_at:
+            return summoner
+        del _summoner_cache[key]
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(url, headers=HEADERS)
-            rate_limiter.record_request()
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data
-            else:
-                print(f"Error fetching summoner: {response.status_code}")
-                return None
-        except Exception as e:
-            print(f"Exception fetching summoner: {e}")
+    url = f"https://{platform}.api.riotgames.com/lol/summoner/v4/summoners/by-puuid/{puuid}"
+    
+    try:
+        response = await riot_api.request_with_retry(url)
+        
+        if response.status_code == 200:
+            data = _json(response)
+            if len(_summoner_cache) >= SUMMONER_CACHE_MAX_SIZE:
+                # Evict the oldest entry (dicts keep insertion order)
+                del _summoner_cache[next(iter(_summoner_cache))]
+            _summoner_cache[key] = (time.monotonic() + SUMMONER_CACHE_TTL_SECONDS, data)
+            return data
+        else:
+            print(f"Error fetching summoner: {response.status_code}")
             return None
+    except Exception as e:
+        print(f"Exception fetching summoner: {e}")
+        return None
 
 
 async def _get_profile_icon_url(icon_id: int, max_retries: int = 3) -> str:
@@ -164,24 +265,28 @@ async def _get_profile_icon_url(icon_id: int, max_retries: int = 3) -> str:
     Returns:
         Valid profile icon URL or default fallback URL
     """
-    # Try multiple Data Dragon versions for compatibility
-    versions_to_try = [DD_VERSION, "14.23.1", "14.22.1", "latest"]
+    validated = _validated_icon_urls.get(icon_id)
+    if validated:
+        return validated
+    
+    client = get_client()
     
-    for version in versions_to_try:
-        url = f"https://ddragon.leagueoflegends.com/cdn/{version}/img/profileicon/{icon_id}.png"
+    # Try multiple Data Dragon versions for compatibility
+    for version in PROFILE_ICON_VERSIONS:
+        url = _icon_url(icon_id, version)
         
         # Quick validation check (no rate limit needed for CDN)
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            try:
-                response = await client.head(url)
-                if response.status_code == 200:
-                    print(f"✓ Profile icon validated: {url}")
-                    return url
-            except Exception:
-                continue
+        try:
+            response = await client.head(url, timeout=5.0)
+            if response.status_code == 200:
+                print(f"✓ Profile icon validated: {url}")
+                _validated_icon_urls[icon_id] = url
+                return url
+        except Exception:
+            continue
     
     # Fallback to a known default icon
-    default_url = f"https://ddragon.leagueoflegends.com/cdn/{DD_VERSION}/img/profileicon/29.png"
+    default_url = _icon_url(DEFAULT_PROFILE_ICON_ID)
     print(f"⚠️ Using default profile icon (ID {icon_id} not found)")
     return default_url
 
@@ -193,50 +298,35 @@ async def _get_summoner_rank(puuid: str, platform: str = "na1") -> Dict[str, Any
     """
     url = f"https://{platform}.api.riotgames.com/lol/league/v4/entries/by-puuid/{puuid}"
     
-    await rate_limiter.wait_if_needed()
-    
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(url, headers=HEADERS)
-            rate_limiter.record_request()
+    try:
+        response = await riot_api.request_with_retry(url)
+        
+        if response.status_code == 200:
+            entries = _json(response)
             
-            if response.status_code == 200:
-                entries = response.json()
-                
-                # Find ranked solo/duo queue
-                ranked_solo = next(
-                    (entry for entry in entries if entry['queueType'] == 'RANKED_SOLO_5x5'),
-                    None
-                )
+            # Find ranked solo/duo queue
+            ranked_solo = next(
+                (entry for entry in entries if entry['queueType'] == 'RANKED_SOLO_5x5'),
+                None
+            )
+            
+            if ranked_solo:
+                wins = ranked_solo['wins']
+                losses = ranked_solo['losses']
+                total_games = wins + losses
+                win_rate = (wins / total_games * 100) if total_games > 0 else 0
                 
-                if ranked_solo:
-                    wins = ranked_solo['wins']
-                    losses = ranked_solo['losses']
-                    total_games = wins + losses
-                    win_rate = (wins / total_games * 100) if total_games > 0 else 0
-                    
-                    return {
-                        "tier": ranked_solo['tier'],
-                        "division": ranked_solo['rank'],
-                        "lp": ranked_solo['leaguePoints'],
-                        "wins": wins,
-                        "losses": losses,
-                        "win_rate": round(win_rate, 1),
-                        "display": f"{ranked_solo['tier'].capitalize()} {ranked_solo['rank']} • {ranked_solo['leaguePoints']} LP"
-                    }
-                else:
-                    # Unranked
-                    return {
-                        "tier": "UNRANKED",
-                        "division": "",
-                        "lp": 0,
-                        "wins": 0,
-                        "losses": 0,
-                        "win_rate": 0,
-                        "display": "Unranked"
-                    }
+                return {
+                    "tier": ranked_solo['tier'],
+                    "division": ranked_solo['rank'],
+                    "lp": ranked_solo['leaguePoints'],
+                    "wins": wins,
+                    "losses": losses,
+                    "win_rate": round(win_rate, 1),
+                    "display": f"{ranked_solo['tier'].capitalize()} {ranked_solo['rank']} • {ranked_solo['leaguePoints']} LP"
+                }
             else:
-                print(f"Error fetching rank: {response.status_code}")
+                # Unranked
                 return {
                     "tier": "UNRANKED",
                     "division": "",
@@ -246,8 +336,8 @@ async def _get_summoner_rank(puuid: str, platform: str = "na1") -> Dict[str, Any
                     "win_rate": 0,
                     "display": "Unranked"
                 }
-        except Exception as e:
-            print(f"Exception fetching rank: {e}")
+        else:
+            print(f"Error fetching rank: {response.status_code}")
             return {
                 "tier": "UNRANKED",
                 "division": "",
@@ -257,74 +347,101 @@ async def _get_summoner_rank(puuid: str, platform: str = "na1") -> Dict[str, Any
                 "win_rate": 0,
                 "display": "Unranked"
             }
+    except Exception as e:
+        print(f"Exception fetching rank: {e}")
+        return {
+            "tier": "UNRANKED",
+            "division": "",
+            "lp": 0,
+            "wins": 0,
+            "losses": 0,
+            "win_rate": 0,
+            "display": "Unranked"
+        }
+
+
+async def _fetch_recent_match_ids(puuid: str, region: str = "americas", sample_size: int = 10) -> List[str]:
+    """Fetch the player's most recent match IDs (empty list on failure)."""
+    url = f"https://{region}.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids"
+    params = {"start": 0, "count": sample_size}
+    
+    try:
+        response = await riot_api.request_with_retry(url, params=params)
+        
+        if response.status_code != 200:
+            return []
+        
+        return _json(response)
+    except Exception as e:
+        print(f"Error fetching recent matches: {e}")
+        return []
 
 
-async def _determine_main_role(puuid: str, region: str = "americas", platform: str = "na1", sample_size: int = 10) -> str:
+async def _aggregate_roles(match_ids: List[str], puuid: str) -> str:
     """
     Determine player's main role from recent match history.
-    Analyzes last 10 matches to find most frequently played role.
+    Finds the most frequently played role across the given matches.
     """
+    if not match_ids:
+        return "Fill"
+    
     try:
-        # Fetch recent match IDs
-        url = f"https://{region}.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids"
-        params = {"start": 0, "count": sample_size}
+        # Fetch match details to get roles
+        role_counts = {}
         
-        await rate_limiter.wait_if_needed()
+        roles = await asyncio.gather(*[
+            _get_match_role(match_id, puuid)
+            for match_id in match_ids
+        ])
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, headers=HEADERS, params=params)
-            rate_limiter.record_request()
-            
-            if response.status_code != 200:
-                return "Fill"
-            
-            match_ids = response.json()
-            
-            if not match_ids:
-                return "Fill"
-            
-            # Fetch match details to get roles
-            role_counts = {}
-            
-            for match_id in match_ids[:sample_size]:
-                match_data = await _get_match_for_role(match_id, puuid, region)
-                
-                if match_data:
-                    role = match_data.get('teamPosition', 'NONE')
-                    if role and role != 'NONE':
-                        role_counts[role] = role_counts.get(role, 0) + 1
-            
-            # Find most common role
-            if role_counts:
-                main_role = max(role_counts, key=role_counts.get)
-                return ROLE_DISPLAY.get(main_role, main_role)
-            else:
-                return "Fill"
+        for role in roles:
+            if role and role != 'NONE':
+                role_counts[role] = role_counts.get(role, 0) + 1
+        
+        # Find most common role
+        if role_counts:
+            main_role = max(role_counts, key=role_counts.get)
+            return ROLE_DISPLAY.get(main_role, main_role)
+        else:
+            return "Fill"
                 
     except Exception as e:
         print(f"Error determining main role: {e}")
         return "Fill"
 
 
-async def _get_match_for_role(match_id: str, puuid: str, region: str = "americas") -> Optional[Dict[str, Any]]:
-    """Fetch match data and extract player's role."""
-    url = f"https://{region}.api.riotgames.com/lol/match/v5/matches/{match_id}"
+async def _get_match_role(match_id: str, puuid: str) -> Optional[str]:
+    """Get the player's teamPosition in a match, memoized per (match, player)."""
+    key = (match_id, puuid)
     
-    await rate_limiter.wait_if_needed()
+    role = _role_cache.get(key)
+    if role is not None:
+        return role
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(url, headers=HEADERS)
-            rate_limiter.record_request()
-            
-            if response.status_code == 200:
-                match_data = response.json()
-                participants = match_data['info']['participants']
-                
-                # Find player in match
-                player = next((p for p in participants if p['puuid'] == puuid), None)
-                return player
-            else:
-                return None
-        except Exception as e:
-            return None
+    player = await _get_match_for_role(match_id, puuid)
+    if not player:
+        return None
+    
+    role = player.get('teamPosition') or 'NONE'
+    if len(_role_cache) >= ROLE_CACHE_MAX_SIZE:
+        # Evict the oldest entry (dicts keep insertion order)
+        del _role_cache[next(iter(_role_cache))]
+    _role_cache[key] = role
+    return role
+
+
+async def _get_match_for_role(match_id: str, puuid: str) -> Optional[Dict[str, Any]]:
+    """Get match data (cache first) and extract player's participant entry."""
+    # Shared with the analysis pipeline, so a match it is already
+    # downloading is awaited rather than fetched a second time
+    match_data = await riot_api.get_match_cached(match_id)
+    if not match_data:
+        return None
+    
+    if match_id not in cache_manager.matches_cache:
+        cache_manager.store_match(match_id, match_data)
+    
+    participants = match_data['info']['participants']
+    
+    # Find player in match
+    return next((p for p in participants if p['puuid'] == puuid), None)
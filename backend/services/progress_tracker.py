@@ -3,16 +3,23 @@ Progress streaming for long-running analysis.
 Allows frontend to see real-time backend progress.
 """
 import asyncio
-import json
-from typing import AsyncGenerator, Dict, Any
+import orjson
+from typing import AsyncGenerator, Dict, Any, Optional, Tuple
 from datetime import datetime
 
+# Keep-alive frames never change, so encode once and reuse
+KEEPALIVE_FRAME = b"data: " + orjson.dumps({'type': 'keepalive'}) + b"\n\n"
+
+# Steps after which no further updates are sent for an analysis
+TERMINAL_STEPS = ("complete", "error")
+
 class ProgressTracker:
     """Thread-safe progress tracker for streaming updates."""
     
     def __init__(self):
         self.subscribers: Dict[str, asyncio.Queue] = {}
-        self.progress: Dict[str, Dict[str, Any]] = {}
+        # Latest (sequence, update) per analysis, kept so reconnects can resume
+        self.progress: Dict[str, Tuple[int, Dict[str, Any]]] = {}
     
     def subscribe(self, analysis_id: str) -> asyncio.Queue:
         """Subscribe to progress updates for an analysis."""
@@ -24,7 +31,10 @@ class ProgressTracker:
         """Unsubscribe from progress updates."""
         if analysis_id in self.subscribers:
             del self.subscribers[analysis_id]
-        if analysis_id in self.progress:
+        
+        # Keep in-flight progress so a reconnecting client can resume
+        latest = self.progress.get(analysis_id)
+        if latest and latest[1]["step"] in TERMINAL_STEPS:
             del self.progress[analysis_id]
     
     async def update(self, analysis_id: str, step: str, progress: int, message: str):
@@ -36,29 +46,43 @@ class ProgressTracker:
             "timestamp": datetime.now().isoformat()
         }
         
-        # Store latest progress
-        self.progress[analysis_id] = update
+        # Store latest progress with its event sequence number
+        seq = self.progress[analysis_id][0] + 1 if analysis_id in self.progress else 1
+        self.progress[analysis_id] = (seq, update)
         
         # Send to subscriber if exists
         if analysis_id in self.subscribers:
             try:
-                await self.subscribers[analysis_id].put(update)
+                await self.subscribers[analysis_id].put((seq, update))
             except:
                 pass  # Subscriber disconnected
     
-    async def stream_progress(self, analysis_id: str) -> AsyncGenerator[str, None]:
-        """Stream progress updates as Server-Sent Events."""
+    async def stream_progress(
+        self,
+        analysis_id: str,
+        last_event_id: Optional[int] = None
+    ) -> AsyncGenerator[bytes, None]:
+        """
+        Stream progress updates as pre-encoded Server-Sent Event frames.
+        
+        Each frame carries an `id:` sequence number. When a client reconnects
+        with Last-Event-ID, the latest update is replayed only if it is newer.
+        """
         queue = self.subscribe(analysis_id)
         
+        latest = self.progress.get(analysis_id)
+        if latest and latest[0] > (last_event_id or 0):
+            await queue.put(latest)
+        
         try:
             while True:
                 # Wait for next update with timeout
                 try:
-                    update = await asyncio.wait_for(queue.get(), timeout=30.0)
-                    yield f"data: {json.dumps(update)}\n\n"
+                    seq, update = await asyncio.wait_for(queue.get(), timeout=30.0)
+                    yield b"id: %d\ndata: %b\n\n" % (seq, orjson.dumps(update))
                 except asyncio.TimeoutError:
                     # Send keep-alive
-                    yield f"data: {json.dumps({'type': 'keepalive'})}\n\n"
+                    yield KEEPALIVE_FRAME
         finally:
             self.unsubscribe(analysis_id)
 
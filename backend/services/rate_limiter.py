@@ -3,8 +3,10 @@ Rate limiter for Riot API Personal Keys.
 Limits: 20 req/s, 100 req/2min
 """
 import asyncio
-from datetime import datetime
-from typing import List
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque
 
 class RateLimiter:
     """Track API requests to respect Riot API rate limits."""
@@ -21,74 +23,87 @@ class RateLimiter:
             self.MAX_REQUESTS_PER_SECOND = requests_per_second
         if requests_per_2min:
             self.MAX_REQUESTS_PER_2_MINUTES = requests_per_2min
-            
-        self.requests_last_second: List[datetime] = []
-        self.requests_last_2_minutes: List[datetime] = []
+        
+        # time.monotonic() request timestamps, oldest first
+        self.requests_last_second: Deque[float] = deque()
+        self.requests_last_2_minutes: Deque[float] = deque()
         self._lock = asyncio.Lock()
         
         print(f"🔧 Rate limiter initialized: {self.MAX_REQUESTS_PER_SECOND}/s, {self.MAX_REQUESTS_PER_2_MINUTES}/2min")
     
+    @staticmethod
+    def _prune(timestamps: Deque[float], now: float, window: float):
+        """Pop timestamps that have left the window off the left of the deque."""
+        while timestamps and now - timestamps[0] >= window:
+            timestamps.popleft()
+    
     async def wait_if_needed(self):
-        """Wait if we're about to exceed rate limits."""
-        async with self._lock:
-            now = datetime.now()
-            
-            # Clean up old timestamps
-            self.requests_last_second = [
-                ts for ts in self.requests_last_second 
-                if (now - ts).total_seconds() < 1
-            ]
-            self.requests_last_2_minutes = [
-                ts for ts in self.requests_last_2_minutes 
-                if (now - ts).total_seconds() < 120
-            ]
-            
-            # Check if we need to wait
-            if len(self.requests_last_second) >= self.MAX_REQUESTS_PER_SECOND:
-                await asyncio.sleep(1.1)  # Wait just over 1 second
-                # Clean again after waiting
-                now = datetime.now()
-                self.requests_last_second = [
-                    ts for ts in self.requests_last_second 
-                    if (now - ts).total_seconds() < 1
-                ]
+        """
+        Wait if we're about to exceed rate limits, then reserve a slot.
+        
+        The slot is recorded before the lock is released, so concurrent
+        callers can't all see spare capacity and overrun the limit together.
+        """
+        # Sleeps happen outside the lock so other callers can check the
+        # windows meanwhile; the lock only guards the deques.
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                
+                # Clean up old timestamps
+                self._prune(self.requests_last_second, now, 1)
+                self._prune(self.requests_last_2_minutes, now, 120)
+                
+                wait_time = 0.0
+                
+                if len(self.requests_last_second) >= self.MAX_REQUESTS_PER_SECOND:
+                    # Wait until the oldest request leaves the 1s window
+                    wait_time = 1.001 - (now - self.requests_last_second[0])
+                
+                if len(self.requests_last_2_minutes) >= self.MAX_REQUESTS_PER_2_MINUTES:
+                    # Wait until oldest request is > 2 minutes old
+                    wait_2min = 121 - (now - self.requests_last_2_minutes[0])
+                    if wait_2min > wait_time:
+                        wait_time = wait_2min
+                        print(f"⏳ Rate limit (100 req/2min) approaching, waiting {wait_time:.1f}s...")
+                
+                if wait_time <= 0:
+                    self.requests_last_second.append(now)
+                    self.requests_last_2_minutes.append(now)
+                    return
             
-            if len(self.requests_last_2_minutes) >= self.MAX_REQUESTS_PER_2_MINUTES:
-                # Wait until oldest request is > 2 minutes old
-                oldest = min(self.requests_last_2_minutes)
-                wait_time = 121 - (now - oldest).total_seconds()
-                if wait_time > 0:
-                    print(f"⏳ Rate limit (100 req/2min) approaching, waiting {wait_time:.1f}s...")
-                    await asyncio.sleep(wait_time)
+            await asyncio.sleep(wait_time)
     
-    def record_request(self):
-        """Record that we made a request."""
-        now = datetime.now()
-        self.requests_last_second.append(now)
-        self.requests_last_2_minutes.append(now)
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        Reserve and record a request slot for one Riot API call.
+        
+        Usage:
+            async with rate_limiter.acquire():
+                response = await client.get(url, headers=HEADERS)
+        """
+        await self.wait_if_needed()
+        yield
     
     def get_stats(self) -> dict:
         """Get current rate limit usage."""
-        now = datetime.now()
+        now = time.monotonic()
         
-        recent_second = [
-            ts for ts in self.requests_last_second 
-            if (now - ts).total_seconds() < 1
-        ]
-        recent_2min = [
-            ts for ts in self.requests_last_2_minutes 
-            if (now - ts).total_seconds() < 120
-        ]
+        self._prune(self.requests_last_second, now, 1)
+        self._prune(self.requests_last_2_minutes, now, 120)
+        recent_second = len(self.requests_last_second)
+        recent_2min = len(self.requests_last_2_minutes)
         
         return {
-            "requests_last_second": len(recent_second),
-            "requests_last_2_minutes": len(recent_2min),
-            "capacity_1s": f"{len(recent_second)}/{self.MAX_REQUESTS_PER_SECOND}",
-            "capacity_2min": f"{len(recent_2min)}/{self.MAX_REQUESTS_PER_2_MINUTES}"
+            "requests_last_second": recent_second,
+            "requests_last_2_minutes": recent_2min,
+            "capacity_1s": f"{recent_second}/{self.MAX_REQUESTS_PER_SECOND}",
+            "capacity_2min": f"{recent_2min}/{self.MAX_REQUESTS_PER_2_MINUTES}"
         }
 
 # Global rate limiter instance 
 rate_limiter = RateLimiter(
     requests_per_second=20,    
     requests_per_2min=100    
-)
\ No newline at end of file
+)
@@ -2,16 +2,142 @@
 Riot API client with rate limiting.
 """
 import os
-import httpx
 import asyncio
-from typing import Optional, Dict, Any
+import random
+import time
+import httpx
+import orjson
+from typing import Optional, Dict, Any, Tuple, NamedTuple
 from dotenv import load_dotenv
 from .rate_limiter import rate_limiter
+from .http_client import get_client
+from . import http_client
+from .cache_manager import cache_manager
 
 load_dotenv()
 RIOT_API_KEY = os.getenv("RIOT_API_KEY")
 HEADERS = {"X-Riot-Token": RIOT_API_KEY}
 
+# Retries for 429s, 5xx and transport errors in request_with_retry
+RIOT_MAX_ATTEMPTS = 4
+RIOT_MAX_BACKOFF = 30
+
+# Max in-flight match requests; the rate limiter still paces the actual calls.
+# Capped at the HTTP pool size so waiting fetches never queue for a socket.
+MATCH_FETCH_CONCURRENCY = min(
+    int(os.getenv("RIOT_MATCH_FETCH_CONCURRENCY", "10")),
+    http_client.MAX_CONNECTIONS
+)
+_match_fetch_semaphore = asyncio.Semaphore(MATCH_FETCH_CONCURRENCY)
+
+# Match fetches currently on the wire, so concurrent callers share one request
+_inflight_matches: Dict[str, asyncio.Future] = {}
+
+# Finished matches never change, so cached details are reused for a year
+MATCH_CACHE_MAX_AGE_HOURS = 24 * 365
+
+
+async def request_with_retry(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    max_attempts: int = RIOT_MAX_ATTEMPTS
+) -> httpx.Response:
+    """
+    GET a Riot API URL through the rate limiter, retrying transient failures.
+    
+    429s wait for Retry-After (at least the backoff); 5xx and transport
+    errors back off exponentially with jitter.
+    
+    Args:
+        url: Riot API URL
+        params: Optional query parameters
+        headers: Request headers including the API key (defaults to HEADERS)
+        max_attempts: Total attempts before giving up
+    
+    Returns:
+        The final response (any status); callers handle non-200s as before.
+        The last transport error is re-raised if every attempt failed.
+    """
+    client = get_client()
+    headers = headers or HEADERS
+    
+    for attempt in range(max_attempts):
+        last_attempt = attempt == max_attempts - 1
+        retry_after = None
+        
+        try:
+            async with rate_limiter.acquire():
+                response = await client.get(url, headers=headers, params=params)
+        except httpx.TransportError:
+            if last_attempt:
+                raise
+        else:
+            if last_attempt or (response.status_code != 429 and response.status_code < 500):
+                return response
+            retry_after = response.headers.get('Retry-After')
+        
+        backoff = min(RIOT_MAX_BACKOFF, 2 ** attempt) + random.uniform(0, 1)
+        if retry_after and retry_after.isdigit():
+            backoff = max(backoff, int(retry_after))
+        print(f"⚠️ Riot API retry {attempt + 1}/{max_attempts - 1} in {backoff:.1f}s")
+        await asyncio.sleep(backoff)
+
+
+class RiotId(NamedTuple):
+    """Riot ID canonicalized once at the route boundary."""
+    game_name: str  # lowercased
+    tag_line: str   # lowercased
+    display: str    # as entered, e.g. "Name#TAG"
+    
+    @classmethod
+    def parse(cls, game_name: str, tag_line: str) -> "RiotId":
+        """Build a RiotId, normalizing case (Riot IDs are case-insensitive)."""
+        return cls(game_name.lower(), tag_line.lower(), f"{game_name}#{tag_line}")
+    
+    @property
+    def key(self) -> Tuple[str, str]:
+        """Case-insensitive identity, used as the cache key."""
+        return (self.game_name, self.tag_line)
+
+
+# PUUIDs never change for a Riot ID, so cache lookups in-process.
+# RiotId.key -> (expires_at, puuid)
+PUUID_CACHE_TTL_SECONDS = 24 * 3600
+PUUID_CACHE_MAX_SIZE = 10000
+_puuid_cache: Dict[Tuple[str, str], Tuple[float, str]] = {}
+
+
+async def get_puuid(riot_id: RiotId) -> Optional[str]:
+    """
+    Resolve a Riot ID to its PUUID, using the in-process TTL cache.
+    
+    Args:
+        riot_id: Parsed Riot ID
+    
+    Returns:
+        PUUID or None
+    """
+    key = riot_id.key
+    
+    cached = _puuid_cache.get(key)
+    if cached:
+        expires_at, puuid = cached
+        if time.monotonic() < expires_at:
+            return puuid
+        del _puuid_cache[key]
+    
+    puuid = await _fetch_puuid(riot_id.game_name, riot_id.tag_line)
+    if not puuid:
+        return None
+    
+    if len(_puuid_cache) >= PUUID_CACHE_MAX_SIZE:
+        # Evict the oldest entry (dicts keep insertion order)
+        del _puuid_cache[next(iter(_puuid_cache))]
+    _puuid_cache[key] = (time.monotonic() + PUUID_CACHE_TTL_SECONDS, puuid)
+    
+    return puuid
+
 
 async def get_puuid_by_riot_id(game_name: str, tag_line: str) -> Optional[str]:
     """
@@ -24,25 +150,26 @@ async def get_puuid_by_riot_id(game_name: str, tag_line: str) -> Optional[str]:
     Returns:
         PUUID or None
     """
+    return await get_puuid(RiotId.parse(game_name, tag_line))
+
+
+async def _fetch_puuid(game_name: str, tag_line: str) -> Optional[str]:
+    """Fetch PUUID for a Riot ID from the account API."""
     url = f"https://americas.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{game_name}/{tag_line}"
     
-    await rate_limiter.wait_if_needed()
-    
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(url, headers=HEADERS)
-            rate_limiter.record_request()
-            
-            if response.status_code == 200:
-                return response.json().get("puuid")
-            elif response.status_code == 404:
-                return None
-            else:
-                print(f"Error fetching PUUID: {response.status_code}")
-                return None
-        except Exception as e:
-            print(f"Exception fetching PUUID: {e}")
+    try:
+        response = await request_with_retry(url)
+        
+        if response.status_code == 200:
+            return orjson.loads(response.content).get("puuid")
+        elif response.status_code == 404:
+            return None
+        else:
+            print(f"Error fetching PUUID: {response.status_code}")
             return None
+    except Exception as e:
+        print(f"Exception fetching PUUID: {e}")
+        return None
 
 
 async def get_match_details(match_id: str) -> Optional[Dict[str, Any]]:
@@ -57,28 +184,71 @@ async def get_match_details(match_id: str) -> Optional[Dict[str, Any]]:
     """
     url = f"https://americas.api.riotgames.com/lol/match/v5/matches/{match_id}"
     
-    await rate_limiter.wait_if_needed()
-    
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(url, headers=HEADERS)
-            rate_limiter.record_request()
-            
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 429:
-                # Server-side rate limit (shouldn't happen with our limiter)
-                retry_after = int(response.headers.get('Retry-After', 10))
-                print(f"⚠️ Server rate limit hit, waiting {retry_after}s")
-                await asyncio.sleep(retry_after)
-                # Retry once
-                return await get_match_details(match_id)
-            else:
-                print(f"Error fetching match {match_id}: {response.status_code}")
-                return None
-        except Exception as e:
-            print(f"Exception fetching match {match_id}: {e}")
+    try:
+        response = await request_with_retry(url)
+        
+        if response.status_code == 200:
+            return orjson.loads(response.content)
+        else:
+            print(f"Error fetching match {match_id}: {response.status_code}")
             return None
+    except Exception as e:
+        print(f"Exception fetching match {match_id}: {e}")
+        return None
+
+
+async def get_match_cached(match_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch match data, serving cached details first.
+    
+    Concurrent callers asking for the same match share one request, so the
+    profile and analysis pipelines never download a match twice. Callers
+    store newly fetched matches in the cache themselves.
+    
+    Args:
+        match_id: Match ID
+    
+    Returns:
+        Match data dict or None
+    """
+    cached = cache_manager.get_match(match_id, max_age_hours=MATCH_CACHE_MAX_AGE_HOURS)
+    if cached:
+        return cached
+    
+    pending = _inflight_matches.get(match_id)
+    if pending is not None:
+        # Shield so one cancelled waiter doesn't cancel the shared fetch
+        return await asyncio.shield(pending)
+    
+    future = asyncio.get_running_loop().create_future()
+    _inflight_matches[match_id] = future
+    
+    try:
+        async with _match_fetch_semaphore:
+            match_data = await _fetch_match(match_id)
+        future.set_result(match_data)
+        return match_data
+    finally:
+        if not future.done():
+            future.set_result(None)
+        _inflight_matches.pop(match_id, None)
+
+
+async def _fetch_match(match_id: str) -> Optional[Dict[str, Any]]:
+    """Request a single match (caller holds a fetch slot)."""
+    url = f"https://americas.api.riotgames.com/lol/match/v5/matches/{match_id}"
+    
+    try:
+        response = await request_with_retry(url)
+    except Exception:
+        print(f"   ⚠️  Giving up on {match_id} after {RIOT_MAX_ATTEMPTS} attempts")
+        return None
+    
+    if response.status_code == 200:
+        return orjson.loads(response.content)
+    if response.status_code == 429 or response.status_code >= 500:
+        print(f"   ⚠️  Giving up on {match_id} after {RIOT_MAX_ATTEMPTS} attempts")
+    return None
 
 
 async def get_match_timeline(match_id: str) -> Optional[Dict[str, Any]]:
@@ -93,17 +263,13 @@ async def get_match_timeline(match_id: str) -> Optional[Dict[str, Any]]:
     """
     url = f"https://americas.api.riotgames.com/lol/match/v5/matches/{match_id}/timeline"
     
-    await rate_limiter.wait_if_needed()
-    
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(url, headers=HEADERS)
-            rate_limiter.record_request()
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return None
-        except Exception as e:
-            print(f"Exception fetching timeline: {e}")
-            return None
\ No newline at end of file
+    try:
+        response = await request_with_retry(url)
+        
+        if response.status_code == 200:
+            return orjson.loads(response.content)
+        else:
+            return None
+    except Exception as e:
+        print(f"Exception fetching timeline: {e}")
+        return None
\ No newline at end of file
@@ -8,10 +8,11 @@ import json
 import httpx
 import boto3
 import statistics
+import pandas as pd
 from typing import Dict, Any, List, Optional
 from botocore.exceptions import ClientError
 from langchain_aws import ChatBedrock
-from . import agent_tools, profile_service
+from . import agent_tools, profile_service, riot_api
 from .rate_limiter import rate_limiter
 from .bedrock_rate_limiter import bedrock_rate_limiter
 from .progress_tracker import progress_tracker
@@ -66,7 +67,7 @@ async def generate_structured_analysis(
         print(f"   Analyzing: {num_matches} matches")
         print(f"{'='*60}\n")
         
-        # Step 1: Get profile data
+        # Step 1: Resolve PUUID (cached after the profile endpoint has run)
         print("📋 Step 1/5: Fetching profile...")
         if analysis_id:
             await progress_tracker.update(
@@ -76,17 +77,16 @@ async def generate_structured_analysis(
                 f"Loading profile for {game_name}#{tag_line}..."
             )
         
-        profile_result = await profile_service.get_player_profile(game_name, tag_line)
+        puuid = await riot_api.get_puuid_by_riot_id(game_name, tag_line)
         
-        if not profile_result.get('success'):
+        if not puuid:
+            error = f"Player {game_name}#{tag_line} not found"
             if analysis_id:
-                await progress_tracker.update(analysis_id, "error", 0, f"Failed to load profile: {profile_result.get('error', 'Unknown error')}")
-            return profile_result
-        
-        profile = profile_result['profile']
-        puuid = profile['puuid']
+                await progress_tracker.update(analysis_id, "error", 0, f"Failed to load profile: {error}")
+            return {"success": False, "error": error}
         
-        # Step 2: Fetch comprehensive match history
+        # Step 2: Fetch comprehensive match history.
+        # Match discovery only needs the PUUID, so run it alongside the profile fetch.
         print(f"\n📥 Step 2/5: Fetching match history...")
         if analysis_id:
             await progress_tracker.update(
@@ -96,12 +96,22 @@ async def generate_structured_analysis(
                 f"Finding {num_matches} recent matches..."
             )
         
-        match_ids, metadata = await agent_tools.fetch_matches_intelligently(
-            puuid=puuid,
-            target_matches=num_matches,
-            max_age_days=365
+        profile_result, (match_ids, metadata) = await asyncio.gather(
+            profile_service.get_player_profile(game_name, tag_line),
+            agent_tools.fetch_matches_intelligently(
+                puuid=puuid,
+                target_matches=num_matches,
+                max_age_days=365
+            )
         )
         
+        if not profile_result.get('success'):
+            if analysis_id:
+                await progress_tracker.update(analysis_id, "error", 0, f"Failed to load profile: {profile_result.get('error', 'Unknown error')}")
+            return profile_result
+        
+        profile = profile_result['profile']
+        
         if not match_ids:
             if analysis_id:
                 await progress_tracker.update(analysis_id, "error", 0, "No recent matches found")
@@ -137,16 +147,14 @@ async def generate_structured_analysis(
                 75, 
                 "Calculating performance trends and champion stats..."
             )
-        performance = agent_tools.calculate_performance_trends(matches_data, puuid)
-        champion_pool = agent_tools.analyze_champion_pool(matches_data, puuid)
-        playstyle = agent_tools.identify_playstyle_personality(matches_data, puuid)
+        # Pandas work runs in a worker thread so the event loop keeps serving
+        performance, champion_pool, playstyle, detailed_stats = await asyncio.to_thread(
+            _compute_match_statistics, matches_data, puuid
+        )
         
         # Get accurate top champions from match data
         top_champions = _extract_top_champions(champion_pool)
         
-        # Extract detailed challenge data
-        detailed_stats = _extract_detailed_stats(matches_data, puuid)
-        
         # Step 5: Use AI to generate complete analysis
         # ========== NEW: DEEP DIVE ANALYSIS (STEPS 4.1 - 4.3) ==========
 
@@ -279,6 +287,23 @@ async def generate_structured_analysis(
         return {"success": False, "error": f"Analysis failed: {str(e)}"}
 
 
+def _compute_match_statistics(matches_data: List[Dict[str, Any]], puuid: str) -> tuple:
+    """
+    Run the CPU-bound analyzers over one shared player frame.
+    
+    Returns:
+        (performance, champion_pool, playstyle, detailed_stats)
+    """
+    player_frame = agent_tools.build_player_frame(matches_data, puuid)
+    
+    return (
+        agent_tools.calculate_performance_trends(player_frame),
+        agent_tools.analyze_champion_pool(player_frame),
+        agent_tools.identify_playstyle_personality(player_frame),
+        _extract_detailed_stats(matches_data, puuid, player_frame),
+    )
+
+
 def _extract_top_champions(champion_pool: Dict[str, Any]) -> List[Dict[str, Any]]:
     """Extract top champions with accurate stats from match data."""
     top_champs = champion_pool.get('top_champions', [])[:5]
@@ -293,10 +318,17 @@ def _extract_top_champions(champion_pool: Dict[str, Any]) -> List[Dict[str, Any]
     ]
 
 
-def _extract_detailed_stats(matches_data: List[Dict[str, Any]], puuid: str) -> Dict[str, Any]:
+def _extract_detailed_stats(
+    matches_data: List[Dict[str, Any]],
+    puuid: str,
+    player_frame: pd.DataFrame
+) -> Dict[str, Any]:
     """
     Extract detailed stats including challenges, timeline patterns.
     This provides the deep data for AI analysis.
+    
+    Per-match basics come from the already built player frame; only the
+    raw challenges are read from the match payloads.
     """
     detailed = {
         "challenge_stats": {},
@@ -304,27 +336,24 @@ def _extract_detailed_stats(matches_data: List[Dict[str, Any]], puuid: str) -> D
         "consistency_metrics": {}
     }
     
-    all_player_stats = []
-    
     for match in matches_data:
-        player_data = agent_tools.extract_comprehensive_player_data(match, puuid)
-        if player_data:
-            all_player_stats.append(player_data)
+        # Extract challenge data
+        idx = agent_tools.find_participant_index(match, puuid)
+        if idx is None:
+            continue
+        
+        player = match['info']['participants'][idx]
+        if 'challenges' in player:
+            challenges = player['challenges']
             
-            # Extract challenge data
-            participants = match['info']['participants']
-            player = next((p for p in participants if p['puuid'] == puuid), None)
-            if player and 'challenges' in player:
-                challenges = player['challenges']
-                
-                # Key challenges for analysis
-                for key in ['laneMinionsFirst10Minutes', 'maxCsAdvantageOnLaneOpponent', 
-                           'soloKills', 'takedownsFirst25Minutes', 'visionScoreAdvantageLaneOpponent',
-                           'controlWardsPlaced', 'stealthWardsPlaced']:
-                    if key in challenges:
-                        if key not in detailed['challenge_stats']:
-                            detailed['challenge_stats'][key] = []
-                        detailed['challenge_stats'][key].append(challenges[key])
+            # Key challenges for analysis
+            for key in ['laneMinionsFirst10Minutes', 'maxCsAdvantageOnLaneOpponent', 
+                       'soloKills', 'takedownsFirst25Minutes', 'visionScoreAdvantageLaneOpponent',
+                       'controlWardsPlaced', 'stealthWardsPlaced']:
+                if key in challenges:
+                    if key not in detailed['challenge_stats']:
+                        detailed['challenge_stats'][key] = []
+                    detailed['challenge_stats'][key].append(challenges[key])
     
     # Calculate averages (iterate over a copy to avoid modification during iteration)
     for key, values in list(detailed['challenge_stats'].items()):
@@ -336,10 +365,7 @@ def _extract_detailed_stats(matches_data: List[Dict[str, Any]], puuid: str) -> D
     early_game_deaths = []
     late_game_deaths = []
     
-    for stats in all_player_stats:
-        duration = stats['game_duration']
-        deaths = stats['deaths']
-        
+    for duration, deaths in zip(player_frame['game_duration'].tolist(), player_frame['deaths'].tolist()):
         if duration < 25:
             early_game_deaths.append(deaths)
         elif duration > 35:
@@ -352,9 +378,9 @@ def _extract_detailed_stats(matches_data: List[Dict[str, Any]], puuid: str) -> D
         }
     
     # Consistency metrics
-    if len(all_player_stats) >= 10:
-        kda_values = [s['kda'] for s in all_player_stats]
-        cs_values = [s['cs_per_min'] for s in all_player_stats]
+    if len(player_frame) >= 10:
+        kda_values = player_frame['kda'].tolist()
+        cs_values = player_frame['cs_per_min'].tolist()
         
         detailed['consistency_metrics'] = {
             'kda_std_dev': statistics.stdev(kda_values) if len(kda_values) > 1 else 0,
@@ -20,6 +20,7 @@ from .bedrock_rate_limiter import bedrock_rate_limiter
 # Global state for retry-safe caching
 _analysis_cache = {
     "matches_data": [],
+    "player_frame": None,
     "performance_trends": None,
     "champion_pool": None,
     "playstyle": None,
@@ -108,6 +109,7 @@ def clear_analysis_cache():
     global _analysis_cache
     _analysis_cache = {
         "matches_data": [],
+        "player_frame": None,
         "performance_trends": None,
         "champion_pool": None,
         "playstyle": None,
@@ -116,6 +118,15 @@ def clear_analysis_cache():
     print("🧹 Analysis cache cleared")
 
 
+def _get_player_frame(puuid: str):
+    """Build the per-match player frame once and reuse it across tools."""
+    if _analysis_cache["player_frame"] is None:
+        _analysis_cache["player_frame"] = agent_tools.build_player_frame(
+            _analysis_cache["matches_data"], puuid
+        )
+    return _analysis_cache["player_frame"]
+
+
 # ========== CACHED TOOLS (RETRY-SAFE) ==========
 
 @tool
@@ -201,6 +212,7 @@ async def get_detailed_match_data(match_ids_json: str) -> str:
         # Fetch and cache
         matches = await agent_tools.get_match_details_batch(match_ids)
         _analysis_cache["matches_data"] = matches
+        _analysis_cache["player_frame"] = None
         
         return json.dumps({
             "status": "success",
@@ -232,7 +244,7 @@ def analyze_performance_trends(puuid: str) -> str:
     if not _analysis_cache["matches_data"]:
         return json.dumps({"error": "No match data loaded. Call get_detailed_match_data first."})
     
-    trends = agent_tools.calculate_performance_trends(_analysis_cache["matches_data"], puuid)
+    trends = agent_tools.calculate_performance_trends(_get_player_frame(puuid))
     _analysis_cache["performance_trends"] = trends
     
     return json.dumps(trends, default=str)
@@ -254,7 +266,7 @@ def analyze_champion_pool(puuid: str) -> str:
     if not _analysis_cache["matches_data"]:
         return json.dumps({"error": "No match data loaded. Call get_detailed_match_data first."})
     
-    champion_data = agent_tools.analyze_champion_pool(_analysis_cache["matches_data"], puuid)
+    champion_data = agent_tools.analyze_champion_pool(_get_player_frame(puuid))
     _analysis_cache["champion_pool"] = champion_data
     
     return json.dumps(champion_data, default=str)
@@ -276,7 +288,7 @@ def identify_playstyle(puuid: str) -> str:
     if not _analysis_cache["matches_data"]:
         return json.dumps({"error": "No match data loaded. Call get_detailed_match_data first."})
     
-    playstyle = agent_tools.identify_playstyle_personality(_analysis_cache["matches_data"], puuid)
+    playstyle = agent_tools.identify_playstyle_personality(_get_player_frame(puuid))
     _analysis_cache["playstyle"] = playstyle
     
     return json.dumps(playstyle, default=str)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Tests for the JSONL cache manager:
+- loading the append-only log (last line per id wins)
+- skipping and repairing a torn final line
+- skipping lines that aren't entries
+- compaction, including appends made while a compaction is running
+- legacy matches.json migration
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+import orjson
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing the module builds the global cache; keep it away from backend/cache
+_global_cache_dir = tempfile.TemporaryDirectory()
+os.environ["CACHE_DIR"] = _global_cache_dir.name
+
+from backend.services.cache_manager import CacheManager
+
+
+def _read_lines(path):
+    with open(path, 'rb') as f:
+        return [orjson.loads(line) for line in f if line.strip()]
+
+
+def test_load_last_entry_wins():
+    """Reloading a log keeps the newest entry per id."""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = CacheManager(cache_dir)
+        cache.store_match("NA1_1", {"round": 1})
+        cache.store_match("NA1_2", {"round": 1})
+        cache.store_match("NA1_1", {"round": 2})
+        cache.store_profile("puuid-1", {"level": 30})
+        cache.flush()
+
+        reloaded = CacheManager(cache_dir)
+        assert reloaded.get_match("NA1_1") == {"round": 2}
+        assert reloaded.get_match("NA1_2") == {"round": 1}
+        assert reloaded.get_profile("puuid-1") == {"level": 30}
+        assert isinstance(reloaded.matches_cache["NA1_1"]["cached_at"], float)
+
+
+def test_torn_line_is_skipped_and_repaired():
+    """A partial final line is ignored, and new appends start on a clean line."""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = CacheManager(cache_dir)
+        cache.store_match("NA1_1", {"ok": True})
+        cache.flush()
+
+        with open(cache.matches_file, 'ab') as f:
+            f.write(b'{"id":"NA1_2","data":{"ok"')
+
+        reloaded = CacheManager(cache_dir)
+        assert list(reloaded.matches_cache) == ["NA1_1"]
+
+        reloaded.store_match("NA1_3", {"ok": True})
+        reloaded.flush()
+
+        assert [entry["id"] for entry in _read_lines(reloaded.matches_file)] == ["NA1_1", "NA1_3"]
+        assert sorted(CacheManager(cache_dir).matches_cache) == ["NA1_1", "NA1_3"]
+
+
+def test_compaction_rewrites_log():
+    """Overwriting entries grows the log until a flush compacts it."""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = CacheManager(cache_dir)
+        for round_number in range(5):
+            for i in range(10):
+                cache.store_match(f"NA1_{i}", {"round": round_number})
+
+        assert cache._log_lines[cache.matches_file] == 50
+        cache.flush()
+
+        lines = _read_lines(cache.matches_file)
+        assert len(lines) == 10
+        assert all(entry["data"] == {"round": 4} for entry in lines)
+        assert cache._log_lines[cache.matches_file] == 10
+        assert cache._log_bytes[cache.matches_file] == os.path.getsize(cache.matches_file)
+
+
+def test_appends_during_background_compaction_are_kept():
+    """Stores made while the flusher compacts in a thread are not lost."""
+    async def run():
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = CacheManager(cache_dir)
+            cache.FLUSH_INTERVAL = 0.01
+            flusher = asyncio.create_task(cache.run_flusher())
+
+            payload = {"frames": list(range(2000))}
+            for round_number in range(20):
+                for i in range(100):
+                    cache.store_match(f"NA1_{round_number % 3}_{i}", payload)
+                await asyncio.sleep(0.005)
+
+            flusher.cancel()
+            while cache._compacting:
+                await asyncio.sleep(0.01)
+            await cache.flush_async()
+
+            assert len(CacheManager(cache_dir).matches_cache) == 300
+
+    asyncio.run(run())
+
+
+def test_bad_line_is_skipped():
+    """A line that isn't an object with an id doesn't hide the lines after it."""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        with open(os.path.join(cache_dir, "matches.jsonl"), 'wb') as f:
+            f.write(b'{"id":"NA1_1","data":{},"cached_at":1.0}\n')
+            f.write(b'{"data":{},"cached_at":1.0}\n')
+            f.write(b'[1,2,3]\n')
+            f.write(b'{"id":"NA1_2","data":{},"cached_at":1.0}\n')
+
+        cache = CacheManager(cache_dir)
+        assert sorted(cache.matches_cache) == ["NA1_1", "NA1_2"]
+        assert [entry["id"] for entry in _read_lines(cache.matches_file)] == ["NA1_1", "NA1_2"]
+
+
+def test_legacy_json_migration():
+    """matches.json is converted once; a corrupt one is left for a retry."""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        with open(os.path.join(cache_dir, "matches.json"), 'wb') as f:
+            f.write(orjson.dumps({
+                "NA1_1": {"data": {"ok": True}, "cached_at": "2025-11-10T10:00:00"}
+            }))
+
+        cache = CacheManager(cache_dir)
+        assert isinstance(cache.matches_cache["NA1_1"]["cached_at"], float)
+        assert [entry["id"] for entry in _read_lines(cache.matches_file)] == ["NA1_1"]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        with open(os.path.join(cache_dir, "matches.json"), 'wb') as f:
+            f.write(b'{"NA1_1": {"data":')
+
+        cache = CacheManager(cache_dir)
+        assert cache.matches_cache == {}
+        assert not os.path.exists(os.path.join(cache_dir, "matches.jsonl"))
+
+
+def test_failed_migration_is_retried():
+    """A migration whose replace fails writes nothing until a later flush succeeds."""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        with open(os.path.join(cache_dir, "matches.json"), 'wb') as f:
+            f.write(orjson.dumps({
+                "NA1_1": {"data": {"ok": True}, "cached_at": "2025-11-10T10:00:00"}
+            }))
+
+        real_replace = os.replace
+
+        def failing_replace(src, dst):
+            raise PermissionError("file in use")
+
+        os.replace = failing_replace
+        try:
+            cache = CacheManager(cache_dir)
+            cache.store_match("NA1_2", {"ok": True})
+            cache.flush()
+            assert not os.path.exists(cache.matches_file)
+        finally:
+            os.replace = real_replace
+
+        cache.flush()
+        assert sorted(entry["id"] for entry in _read_lines(cache.matches_file)) == ["NA1_1", "NA1_2"]
+        assert sorted(CacheManager(cache_dir).matches_cache) == ["NA1_1", "NA1_2"]
+
+
+if __name__ == "__main__":
+    test_load_last_entry_wins()
+    test_torn_line_is_skipped_and_repaired()
+    test_compaction_rewrites_log()
+    test_bad_line_is_skipped()
+    test_appends_during_background_compaction_are_kept()
+    test_legacy_json_migration()
+    test_failed_migration_is_retried()
+    print("✅ All cache manager tests passed!")
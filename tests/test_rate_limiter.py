@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for the sliding-window rate limiter:
+- concurrent acquire() calls never exceed the per-second limit
+- waiters are released once the oldest request leaves the window
+"""
+import asyncio
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.rate_limiter import RateLimiter
+
+PER_SECOND = 5
+CALLERS = 12
+
+
+async def _grant_times(limiter, callers):
+    """Start all callers at once and return the monotonic time each slot was granted."""
+    granted = []
+
+    async def caller():
+        async with limiter.acquire():
+            granted.append(time.monotonic())
+
+    await asyncio.gather(*[caller() for _ in range(callers)])
+    return sorted(granted)
+
+
+def test_concurrent_acquire_respects_per_second_limit():
+    """No 1s window ever holds more than MAX_REQUESTS_PER_SECOND grants."""
+    limiter = RateLimiter(requests_per_second=PER_SECOND, requests_per_2min=1000)
+    granted = asyncio.run(_grant_times(limiter, CALLERS))
+
+    assert len(granted) == CALLERS
+    for i, start in enumerate(granted):
+        in_window = sum(1 for t in granted[i:] if t - start < 1)
+        assert in_window <= limiter.MAX_REQUESTS_PER_SECOND, (i, in_window)
+
+
+def test_waiters_released_when_oldest_expires():
+    """Blocked callers proceed about 1s after the burst, not later."""
+    limiter = RateLimiter(requests_per_second=PER_SECOND, requests_per_2min=1000)
+    granted = asyncio.run(_grant_times(limiter, CALLERS))
+
+    first_burst = granted[:PER_SECOND]
+    assert first_burst[-1] - first_burst[0] < 0.1
+
+    # Each later batch waits for the batch before it to leave the window
+    for batch_start in range(PER_SECOND, CALLERS, PER_SECOND):
+        waited = granted[batch_start] - granted[batch_start - PER_SECOND]
+        assert 1.0 <= waited < 1.2, (batch_start, waited)
+
+    # 12 callers at 5/s: two refills, so roughly 2s end to end
+    expected = (CALLERS - 1) // PER_SECOND
+    assert expected <= granted[-1] - granted[0] < expected + 0.3
+
+
+if __name__ == "__main__":
+    test_concurrent_acquire_respects_per_second_limit()
+    test_waiters_released_when_oldest_expires()
+    print("✅ All rate limiter tests passed!")